@@ -1,10 +1,454 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, make_response
+from abc import ABC, abstractmethod
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from itertools import islice
+import json
+import os
+import queue
+import secrets
+import sqlite3
+import threading
 
 app = Flask(__name__)
 
-# In-memory data store (simplified)
-notes = {}
-next_id = 1
+# ==================== Durable Storage ====================
+#
+# DurableDict keeps its data in memory (reads never touch the disk) and logs
+# every write to an append-only write-ahead log, <path>.wal. A write returns
+# once its log record is on disk; with group commit, writers that arrive
+# while an fsync is running share the next one instead of queueing one each.
+# Every snapshot_every writes the whole table is saved to <path>.snapshot and
+# the log starts over, so startup = load the snapshot + replay a short log.
+# Values must be JSON-serialisable; a value changed in place must be assigned
+# again to be logged.
+#   fsync='group'   fsync every write, batching concurrent writers (default)
+#   fsync='always'  one fsync per write, no batching
+#   fsync='off'     leave flushing to the OS (survives a process crash, not a power loss)
+SNAPSHOT_EVERY = int(os.environ.get('SNAPSHOT_EVERY', 10_000))
+
+
+class DurableDict(MutableMapping):
+    """Dict-like table with a write-ahead log and snapshots (in memory only if path is None)"""
+
+    def __init__(self, path=None, fsync='group', snapshot_every=SNAPSHOT_EVERY):
+        self.path = path
+        self.fsync = fsync
+        self.snapshot_every = snapshot_every
+        self._data = {}
+        self._lock = threading.Lock()       # orders log records and memory updates
+        self._sync_lock = threading.Lock()  # one fsync at a time
+        self._written = 0                   # records written to the log
+        self._synced = 0                    # records known to be on disk
+        self._wal_records = 0
+        self._wal = None
+        if path is not None:
+            self._recover()
+            self._wal = open(f'{path}.wal', 'a', encoding='utf-8')
+
+    # Reads: plain dict operations
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def values(self):
+        return self._data.values()
+
+    def items(self):
+        return self._data.items()
+
+    # Writes: logged, then applied
+    def __setitem__(self, key, value):
+        self._commit(['set', key, value])
+
+    def __delitem__(self, key):
+        if key not in self._data:
+            raise KeyError(key)
+        self._commit(['del', key])
+
+    def _apply(self, record):
+        if record[0] == 'set':
+            self._data[record[1]] = record[2]
+        else:
+            self._data.pop(record[1], None)
+
+    def _commit(self, record):
+        if self._wal is None:
+            self._apply(record)
+            return
+
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        with self._lock:
+            self._wal.write(line)
+            self._wal.flush()
+            self._apply(record)
+            self._written += 1
+            self._wal_records += 1
+            sequence = self._written
+            if self._wal_records >= self.snapshot_every:
+                self._snapshot()
+        self._sync(sequence)
+
+    def _sync(self, sequence):
+        if self.fsync == 'off':
+            return
+        with self._sync_lock:
+            if self.fsync == 'group' and self._synced >= sequence:
+                return  # another writer's fsync already covered this record
+            target = self._written
+            os.fsync(self._wal.fileno())
+            self._synced = target
+
+    def _snapshot(self):
+        # Called with self._lock held: no write can slip in between
+        tmp_path = f'{self.path}.snapshot.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for key, value in self._data.items():
+                f.write(json.dumps([key, value], separators=(',', ':')) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, f'{self.path}.snapshot')
+        if hasattr(os, 'O_DIRECTORY'):
+            dir_fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+        # Everything logged so far is in the snapshot: start a new log
+        with self._sync_lock:
+            self._wal.close()
+            self._wal = open(f'{self.path}.wal', 'w', encoding='utf-8')
+            self._synced = self._written
+        self._wal_records = 0
+
+    def _recover(self):
+        snapshot_path = f'{self.path}.snapshot'
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, encoding='utf-8') as f:
+                for line in f:
+                    key, value = json.loads(line)
+                    self._data[key] = value
+
+        wal_path = f'{self.path}.wal'
+        if not os.path.exists(wal_path):
+            return
+        valid_bytes = 0
+        with open(wal_path, 'rb') as f:
+            for line in f:
+                # A crash can leave a half-written last record: drop it
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                self._apply(record)
+                self._wal_records += 1
+                valid_bytes += len(line)
+        os.truncate(wal_path, valid_bytes)
+
+    def snapshot(self):
+        """Save the whole table now and start a new log"""
+        if self._wal is not None:
+            with self._lock:
+                self._snapshot()
+
+    def close(self):
+        if self._wal is not None:
+            with self._lock, self._sync_lock:
+                self._wal.flush()
+                os.fsync(self._wal.fileno())
+                self._wal.close()
+                self._wal = None
+
+
+# Data store: in memory, or persisted with a write-ahead log when NOTES_DB_PATH is set
+NOTES_DB_PATH = os.environ.get('NOTES_DB_PATH')
+NOTES_FSYNC = os.environ.get('NOTES_FSYNC', 'group')
+
+# ==================== Note Repository ====================
+#
+# Routes go through a NoteRepository, so the storage can be swapped without
+# changing them:
+#   NOTES_STORE=dict    a DurableDict (default; in memory, or logged to
+#                       NOTES_DB_PATH as described above)
+#   NOTES_STORE=sqlite  the SQLite database at NOTES_DB_PATH (default
+#                       notes.sqlite3), which several processes can share
+# SQLite runs in WAL mode with pooled connections, which keep their prepared statements.
+NOTES_STORE = os.environ.get('NOTES_STORE', 'dict')
+SQLITE_POOL_SIZE = int(os.environ.get('SQLITE_POOL_SIZE', 8))
+SQLITE_BUSY_TIMEOUT = float(os.environ.get('SQLITE_BUSY_TIMEOUT', 5))
+
+
+class SQLiteConnectionPool:
+    """Connections checked out for one operation each and reused; at most size idle ones are kept"""
+
+    def __init__(self, path, size=SQLITE_POOL_SIZE, timeout=SQLITE_BUSY_TIMEOUT):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+
+    def _connect(self):
+        # isolation_level=None: autocommit, every statement is its own transaction
+        connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                     check_same_thread=False, cached_statements=64)
+        connection.row_factory = sqlite3.Row
+        connection.execute('PRAGMA journal_mode=WAL')
+        # Safe with WAL: a power loss can lose the last commits, never corrupt the file
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    @contextmanager
+    def connection(self):
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            connection = self._connect()
+        try:
+            yield connection
+        finally:
+            if self._idle.qsize() < self.size:
+                self._idle.put(connection)
+            else:
+                connection.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class NoteRepository(ABC):
+    """
+    Storage interface used by the routes; notes are dicts with id, title and content.
+
+    epoch is a token that changes whenever the store starts from scratch, so
+    revisions and versions from an earlier store can't be mistaken for current ones.
+    """
+
+    @abstractmethod
+    def add(self, note):
+        """Store a new note, assigning its id; returns the stored note"""
+
+    @abstractmethod
+    def get(self, note_id):
+        """The note, or None if it does not exist"""
+
+    @abstractmethod
+    def all(self):
+        """All notes, in creation order, read lazily (an iterator)"""
+
+    @abstractmethod
+    def revision(self, note_id):
+        """The note's revision, bumped by every update; None if it doesn't exist"""
+
+    @abstractmethod
+    def version(self):
+        """Store-wide version, bumped by every write"""
+
+
+class DictNoteRepository(NoteRepository):
+    """Notes in a dict or DurableDict: no setup, used by default and in tests"""
+
+    def __init__(self, table=None):
+        self.table = {} if table is None else table
+        self._next_id = max(self.table, default=0) + 1
+        self._lock = threading.Lock()
+        # Counters live in memory: a restart starts a new epoch
+        self.epoch = secrets.token_hex(4)
+        self._version = 0
+
+    def add(self, note):
+        with self._lock:
+            note = {'id': self._next_id, **note}
+            self._next_id += 1
+            self.table[note['id']] = note
+            self._version += 1
+        return note
+
+    def get(self, note_id):
+        return self.table.get(note_id)
+
+    def all(self):
+        # Only the ids are copied up front, so notes added while a response
+        # is streaming don't break the iteration
+        for note_id in list(self.table):
+            note = self.table.get(note_id)
+            if note is not None:
+                yield note
+
+    def revision(self, note_id):
+        # Notes have no update path yet, so every note is at its first revision
+        return 1 if note_id in self.table else None
+
+    def version(self):
+        return self._version
+
+
+class SQLiteNoteRepository(NoteRepository):
+    """Notes in a SQLite table keyed (and indexed) by id"""
+
+    SCHEMA = [
+        'CREATE TABLE IF NOT EXISTS notes ('
+        ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+        ' title TEXT NOT NULL,'
+        ' content TEXT NOT NULL,'
+        ' revision INTEGER NOT NULL DEFAULT 1)',
+        # One row: the epoch, set when the database is created, and the version,
+        # bumped by triggers so writes from every process count
+        'CREATE TABLE IF NOT EXISTS meta ('
+        ' id INTEGER PRIMARY KEY CHECK (id = 1),'
+        ' epoch TEXT NOT NULL,'
+        ' version INTEGER NOT NULL)',
+        'CREATE TRIGGER IF NOT EXISTS notes_inserted AFTER INSERT ON notes'
+        ' BEGIN UPDATE meta SET version = version + 1; END',
+        'CREATE TRIGGER IF NOT EXISTS notes_updated AFTER UPDATE OF title, content ON notes'
+        ' BEGIN UPDATE notes SET revision = revision + 1 WHERE id = NEW.id;'
+        ' UPDATE meta SET version = version + 1; END',
+        'CREATE TRIGGER IF NOT EXISTS notes_deleted AFTER DELETE ON notes'
+        ' BEGIN UPDATE meta SET version = version + 1; END'
+    ]
+    CREATE_META = 'INSERT OR IGNORE INTO meta (id, epoch, version) VALUES (1, ?, 0)'
+    EPOCH = 'SELECT epoch FROM meta'
+    ADD = 'INSERT INTO notes (title, content) VALUES (?, ?)'
+    GET = 'SELECT id, title, content FROM notes WHERE id = ?'
+    LIST = 'SELECT id, title, content FROM notes ORDER BY id'
+    REVISION = 'SELECT revision FROM notes WHERE id = ?'
+    VERSION = 'SELECT version FROM meta'
+
+    def __init__(self, path, pool_size=SQLITE_POOL_SIZE):
+        self.pool = SQLiteConnectionPool(path, pool_size)
+        with self.pool.connection() as connection:
+            for statement in self.SCHEMA:
+                connection.execute(statement)
+            connection.execute(self.CREATE_META, (secrets.token_hex(4),))
+            self.epoch = connection.execute(self.EPOCH).fetchone()[0]
+
+    def add(self, note):
+        with self.pool.connection() as connection:
+            note_id = connection.execute(self.ADD, (note['title'], note['content'])).lastrowid
+        return {'id': note_id, **note}
+
+    def get(self, note_id):
+        with self.pool.connection() as connection:
+            row = connection.execute(self.GET, (note_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def all(self):
+        # The connection stays checked out until the caller is done reading
+        with self.pool.connection() as connection:
+            cursor = connection.execute(self.LIST)
+            try:
+                for row in cursor:
+                    yield dict(row)
+            finally:
+                cursor.close()
+
+    def revision(self, note_id):
+        with self.pool.connection() as connection:
+            row = connection.execute(self.REVISION, (note_id,)).fetchone()
+        return row['revision'] if row is not None else None
+
+    def version(self):
+        with self.pool.connection() as connection:
+            return connection.execute(self.VERSION).fetchone()['version']
+
+
+def create_note_repository():
+    if NOTES_STORE == 'sqlite':
+        return SQLiteNoteRepository(NOTES_DB_PATH or 'notes.sqlite3')
+    return DictNoteRepository(DurableDict(NOTES_DB_PATH, fsync=NOTES_FSYNC))
+
+
+notes = create_note_repository()
+
+
+# ==================== Streaming Responses ====================
+#
+# Large listings are streamed STREAM_CHUNK_SIZE items at a time, as a JSON array or NDJSON.
+STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', 1000))
+
+
+def json_encoder():
+    # Same options as jsonify (sorted keys, ASCII, dates...), compact
+    return json.JSONEncoder(default=app.json.default, ensure_ascii=app.json.ensure_ascii,
+                            sort_keys=app.json.sort_keys, separators=(',', ':'))
+
+
+def wants_ndjson():
+    best = request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson'])
+    return best == 'application/x-ndjson'
+
+
+def iter_chunks(items, chunk_size=STREAM_CHUNK_SIZE):
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_json_array(items):
+    encode = json_encoder().encode
+    yield '['
+    separator = ''
+    for chunk in iter_chunks(items):
+        # One encode() per chunk keeps the per-item work in the C encoder
+        yield separator + encode(chunk)[1:-1]
+        separator = ','
+    yield ']'
+
+
+def iter_ndjson(items):
+    encode = json_encoder().encode
+    for chunk in iter_chunks(items):
+        yield '\n'.join(map(encode, chunk)) + '\n'
+
+
+def stream_items(items):
+    """Response streaming items as a JSON array, or as NDJSON if the client asks"""
+    if wants_ndjson():
+        return Response(iter_ndjson(items), mimetype='application/x-ndjson')
+    return Response(iter_json_array(items), mimetype='application/json')
+
+
+# ==================== Conditional Requests ====================
+#
+# Responses carry a strong ETag built from counters rather than from the
+# body, so checking a client's cached copy (If-None-Match) costs no
+# serialisation at all:
+#   a note:   epoch-id-revision  (changes when that note changes)
+#   listings: epoch-version      (changes on any write to the store)
+
+
+def note_etag(note_id):
+    revision = notes.revision(note_id)
+    return f'{notes.epoch}-{note_id}-{revision}' if revision is not None else None
+
+
+def not_modified(etag):
+    """304 response if the client's copy (If-None-Match) is still current, else None"""
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = make_response('', 304)
+    response.set_etag(etag)
+    return response
 
 
 @app.route('/health', methods=['_____'])  # TODO: Set the correct HTTP method
@@ -24,7 +468,12 @@ def notes_collection():
     """List notes and create a new note (simplified)"""
     # Handle listing
     if request.method == 'GET':
-        return jsonify(list(notes.values())), 200
+        # JSON and NDJSON are different representations: they need different ETags
+        etag = f'{notes.epoch}-{notes.version()}' + ('-ndjson' if wants_ndjson() else '')
+        response = not_modified(etag) or stream_items(notes.all())
+        response.set_etag(etag)
+        response.vary.add('Accept')
+        return response
 
     # Handle creation
     # TODO: Validate Content-Type is JSON; otherwise return 415
@@ -51,28 +500,30 @@ def notes_collection():
         # Return 400 Bad Request
         return jsonify({'error': 'Invalid input', 'details': errors}), 400
 
-    global next_id
-    note_id = next_id
-    next_id += 1
-
-    # Build the note object
-    note = {
-        'id': note_id,
+    # Build the note object (the repository assigns its id)
+    note = notes.add({
         'title': title.strip(),
         'content': content.strip()
-    }
-    notes[note_id] = note
+    })
     return jsonify(note), 201
 
 
 @app.route('/notes/<int:note_id>', methods=['_____'])  # TODO: Set the correct HTTP method for retrieval
 # Hint: Use 'GET'
 def note_item(note_id):
-    """Return a single note by id"""
+    """Return a single note by id (or 304 if the client's copy is current)"""
+    etag = note_etag(note_id)
+    if etag is not None:
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+
     note = notes.get(note_id)
     if not note:
         return jsonify({'error': 'Not Found', 'message': 'Note not found'}), 404
-    return jsonify(note), 200
+    response = jsonify(note)
+    response.set_etag(etag)
+    return response, 200
 
 
 # Error Handlers (keep response shape consistent)
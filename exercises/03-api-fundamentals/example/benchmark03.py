@@ -0,0 +1,75 @@
+"""
+Benchmark: DurableDict writes per second with fsync batching on and off
+
+Writer threads store WRITES notes in a file-backed DurableDict using each
+fsync mode:
+- always: one fsync per write (batching off)
+- group:  group commit, concurrent writers share an fsync (batching on)
+- off:    no fsync at all (upper bound, not power-loss safe)
+Then it times recovery (snapshot load + log replay) of RECOVERY_NOTES notes.
+example13.py (13-api-versioning) keeps its notes in the same DurableDict,
+so the numbers apply there too.
+
+Run:
+    python benchmark03.py
+"""
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from example03 import DurableDict
+
+WRITES = 2_000
+THREADS = [1, 16]
+RECOVERY_NOTES = 100_000
+
+
+def note(note_id):
+    return {'id': note_id, 'title': f'Note {note_id}', 'content': 'Benchmark note content'}
+
+
+def writes_per_second(directory, fsync, threads):
+    path = os.path.join(directory, f'{fsync}-{threads}.db')
+    store = DurableDict(path, fsync=fsync, snapshot_every=WRITES * 2)
+
+    def write(note_id):
+        store[note_id] = note(note_id)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(write, range(WRITES)))
+    elapsed = time.perf_counter() - start
+    store.close()
+    return WRITES / elapsed
+
+
+def recovery_seconds(directory, snapshot):
+    path = os.path.join(directory, f'recovery-{snapshot}.db')
+    store = DurableDict(path, fsync='off', snapshot_every=RECOVERY_NOTES * 2)
+    for note_id in range(RECOVERY_NOTES):
+        store[note_id] = note(note_id)
+    if snapshot:
+        store.snapshot()
+    store.close()
+
+    start = time.perf_counter()
+    recovered = DurableDict(path)
+    elapsed = time.perf_counter() - start
+    assert len(recovered) == RECOVERY_NOTES
+    recovered.close()
+    return elapsed
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory(dir='.') as directory:
+        print(f"{WRITES:,} writes per run")
+        print(f"{'fsync':>6} | " + ' | '.join(f'{n:>3} threads' for n in THREADS))
+        print('-' * (9 + 14 * len(THREADS)))
+        for fsync in ('always', 'group', 'off'):
+            rates = [writes_per_second(directory, fsync, threads) for threads in THREADS]
+            print(f"{fsync:>6} | " + ' | '.join(f'{rate:>8,.0f}/s' for rate in rates))
+
+        print(f"\nrecovery of {RECOVERY_NOTES:,} notes")
+        print(f"  replaying the log only : {recovery_seconds(directory, snapshot=False):.2f} s")
+        print(f"  loading the snapshot   : {recovery_seconds(directory, snapshot=True):.2f} s")
@@ -0,0 +1,81 @@
+"""
+Benchmark: peak memory and time to first byte of GET /notes with 1M notes
+
+Each run starts a fresh process, fills the store with NOTES notes and
+downloads GET /notes once through the test client:
+- buffered: the old handler, jsonify(list of every note)
+- json:     the streamed JSON array
+- ndjson:   the streamed NDJSON (Accept: application/x-ndjson)
+for both the dict store and the SQLite store. Reported: time to the first
+byte, total time, and how far the request pushed the peak RSS above the
+peak reached while filling the store.
+
+Run:
+    python benchmark03_stream.py
+"""
+import multiprocessing
+import os
+import resource
+import sqlite3
+import tempfile
+import time
+
+NOTES = 1_000_000
+
+
+def peak_rss_mib():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run(store, mode, directory, results):
+    os.environ['NOTES_STORE'] = store
+    os.environ['NOTES_DB_PATH'] = os.path.join(directory, 'notes.sqlite3')
+    if store == 'dict':
+        del os.environ['NOTES_DB_PATH']  # in memory, no write-ahead log
+    import example03
+    from flask import jsonify
+
+    if store == 'dict':
+        for i in range(NOTES):
+            example03.notes.add({'title': f'Note {i}', 'content': 'Benchmark note content'})
+    else:
+        with sqlite3.connect(os.environ['NOTES_DB_PATH']) as connection:
+            connection.executemany('INSERT INTO notes (title, content) VALUES (?, ?)',
+                                   ((f'Note {i}', 'Benchmark note content') for i in range(NOTES)))
+
+    example03.app.add_url_rule('/notes-buffered', 'notes_buffered',
+                               lambda: (jsonify(list(example03.notes.all())), 200))
+    client = example03.app.test_client()
+    path = '/notes-buffered' if mode == 'buffered' else '/notes'
+    headers = {'Accept': 'application/x-ndjson'} if mode == 'ndjson' else {}
+
+    baseline = peak_rss_mib()
+    start = time.perf_counter()
+    response = client.get(path, headers=headers, buffered=False)
+    size = 0
+    ttfb = None
+    for chunk in response.iter_encoded():
+        if ttfb is None and chunk:
+            ttfb = time.perf_counter() - start
+        size += len(chunk)
+    elapsed = time.perf_counter() - start
+    response.close()
+    results.put((ttfb, elapsed, size, peak_rss_mib() - baseline))
+
+
+if __name__ == '__main__':
+    context = multiprocessing.get_context('spawn')
+    print(f"GET /notes with {NOTES:,} notes")
+    print(f"{'store':<6} | {'mode':<8} | {'TTFB':>9} | {'total':>7} | {'size':>8} | {'extra peak RSS':>14}")
+    print('-' * 67)
+    for store in ('dict', 'sqlite'):
+        for mode in ('buffered', 'json', 'ndjson'):
+            with tempfile.TemporaryDirectory() as directory:
+                results = context.Queue()
+                process = context.Process(target=run, args=(store, mode, directory, results))
+                process.start()
+                ttfb, elapsed, size, extra_rss = results.get()
+                process.join()
+            print(f"{store:<6} | {mode:<8} | {ttfb * 1000:>6.1f} ms | {elapsed:>5.2f} s | "
+                  f"{size / 2**20:>4.0f} MiB | {extra_rss:>10.0f} MiB")
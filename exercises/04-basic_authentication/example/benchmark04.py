@@ -0,0 +1,42 @@
+"""
+Benchmark: Basic Auth throughput with a cold vs. warm credential cache
+
+Cold: the verified-credential cache is cleared before every request, so each
+request pays for the full check_password_hash derivation.
+Warm: the credentials were verified once and every request is a cache hit.
+
+Run:
+    python benchmark04.py
+"""
+import base64
+import time
+
+import example04
+from example04 import app, users
+from werkzeug.security import generate_password_hash
+
+COLD_REQUESTS = 20
+WARM_REQUESTS = 2_000
+
+
+def run(client, headers, n, cold):
+    start = time.perf_counter()
+    for _ in range(n):
+        if cold:
+            example04._auth_cache.clear()
+        response = client.get('/users', headers=headers)
+        assert response.status_code == 200
+    elapsed = time.perf_counter() - start
+    return n / elapsed
+
+
+if __name__ == '__main__':
+    users['admin'] = generate_password_hash('admin123')
+    token = base64.b64encode(b'admin:admin123').decode()
+    headers = {'Authorization': f'Basic {token}'}
+    client = app.test_client()
+
+    cold = run(client, headers, COLD_REQUESTS, cold=True)
+    warm = run(client, headers, WARM_REQUESTS, cold=False)
+    print(f"cold cache: {cold:>10.1f} req/s")
+    print(f"warm cache: {warm:>10.1f} req/s  ({warm / cold:.0f}x)")
@@ -1,3 +1,9 @@
+from collections import OrderedDict
+import hashlib
+import secrets
+import threading
+import time
+
 from flask import Flask, request, jsonify
 from flask_httpauth import HTTPBasicAuth
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -7,9 +13,54 @@ auth = HTTPBasicAuth()
 
 users = {}
 
+# Cache of recently verified credentials
+# check_password_hash is deliberately slow, so successful logins are remembered
+# for a short time. Entries are keyed by a keyed BLAKE2 digest of
+# username:password (the plaintext is never stored) and remember the password
+# hash they were verified against: when a user's password changes, the stored
+# hash changes and the old entry is ignored.
+AUTH_CACHE_TTL = 300        # seconds
+AUTH_CACHE_MAX_SIZE = 1024  # entries
+_auth_cache_key = secrets.token_bytes(32)
+_auth_cache = OrderedDict()  # digest -> (password_hash, expires_at)
+_auth_cache_lock = threading.Lock()
+
+
+def _credential_digest(username, password):
+    data = f"{username}\0{password}".encode()
+    return hashlib.blake2b(data, key=_auth_cache_key, digest_size=32).digest()
+
+
+def check_credentials(username, password):
+    """Check a username/password pair, using the verified-credential cache"""
+    password_hash = users.get(username)
+    if password_hash is None:
+        return False
+
+    digest = _credential_digest(username, password)
+    now = time.monotonic()
+    with _auth_cache_lock:
+        entry = _auth_cache.get(digest)
+        if entry is not None:
+            if entry[0] == password_hash and entry[1] > now:
+                _auth_cache.move_to_end(digest)
+                return True
+            del _auth_cache[digest]
+
+    if not check_password_hash(password_hash, password):
+        return False
+
+    with _auth_cache_lock:
+        _auth_cache[digest] = (password_hash, now + AUTH_CACHE_TTL)
+        _auth_cache.move_to_end(digest)
+        while len(_auth_cache) > AUTH_CACHE_MAX_SIZE:
+            _auth_cache.popitem(last=False)
+    return True
+
+
 @auth.verify_password
 def verify_password(username, password):
-    if username in users and check_password_hash(users[username], password):
+    if check_credentials(username, password):
         return username
     return None
 
@@ -15,6 +15,20 @@ users = {
     # }
 }
 
+# Reverse index: api_key -> username
+# Lets the API key decorator find the owner of a key with a single dict lookup
+# instead of scanning every user. Always update it through set_api_key().
+api_keys = {}
+
+
+def set_api_key(username, api_key):
+    """Assign an API key to a user, keeping the api_keys index in sync"""
+    old_key = users[username].get('api_key')
+    if old_key is not None:
+        api_keys.pop(old_key, None)
+    users[username]['api_key'] = api_key
+    api_keys[api_key] = username
+
 
 # ============================================================================
 # BASIC AUTH VERIFICATION (for API key retrieval only)
@@ -49,11 +63,10 @@ def api_key_required(f):
             return jsonify({'error': 'API key missing', 'message': 'Include x-api-key header'}), 401
 
         # TODO: Verify if the API key exists in our users database
-        # Hint: Loop through users and check if any user has this API key
-        for username, user_data in users.items():
-            if user_data.get('api_key') == _____:  # Hint: Compare with api_key variable
-                # API key is valid, call the protected function
-                return f(*args, **kwargs)
+        # Hint: Look the key up in the api_keys index (api_key -> username)
+        if _____ in api_keys:  # Hint: Use the api_key variable
+            # API key is valid, call the protected function
+            return f(*args, **kwargs)
 
         # API key not found in database
         return jsonify({'error': 'Invalid API key', 'message': 'API key not recognized'}), 401
@@ -88,9 +101,9 @@ def register():
 
     # Store user with hashed password and API key
     users[username] = {
-        'password': generate_password_hash(password),
-        'api_key': api_key
+        'password': generate_password_hash(password)
     }
+    set_api_key(username, api_key)
 
     return jsonify({
         'message': 'User registered successfully',
@@ -121,6 +134,25 @@ def get_api_key():
     }), 200
 
 
+@app.route('/api-key/rotate', methods=['POST'])
+@auth.login_required
+def rotate_api_key():
+    """
+    Replace your API key with a new one - Protected by Basic Auth
+
+    The old key stops working immediately.
+    """
+    current_user = auth.current_user()
+    api_key = str(uuid.uuid4())
+    set_api_key(current_user, api_key)
+
+    return jsonify({
+        'message': 'API key rotated successfully',
+        'username': current_user,
+        'api_key': api_key
+    }), 200
+
+
 # ============================================================================
 # API KEY PROTECTED ENDPOINTS (the main pattern to learn)
 # ============================================================================
@@ -162,6 +194,7 @@ if __name__ == '__main__':
     print("  POST /register  - Register new user, receive API key")
     print("\nBasic Auth protected endpoints:")
     print("  GET  /api-key   - Retrieve your API key (requires username:password)")
+    print("  POST /api-key/rotate - Replace your API key (requires username:password)")
     print("\nAPI Key protected endpoints:")
     print("  GET  /users     - List all users (requires x-api-key header)")
     print("\nExamples:")
@@ -0,0 +1,56 @@
+"""
+Benchmark: API key authentication latency vs. number of registered keys
+
+Fills the in-memory database of example05.py with N users and measures the
+average time the api_key_required decorator needs to accept a valid key.
+Thanks to the api_keys index the latency should stay flat from 100 to
+1,000,000 keys.
+
+Run:
+    python benchmark05.py
+"""
+import time
+import uuid
+
+from flask import jsonify
+
+from example05 import app, users, api_keys, api_key_required, set_api_key
+
+SIZES = [100, 10_000, 100_000, 1_000_000]
+REQUESTS = 2_000
+
+
+@app.route('/bench', methods=['GET'])
+@api_key_required
+def bench():
+    return jsonify({'ok': True}), 200
+
+
+def seed(n):
+    """Register n users directly (skips password hashing, it is not measured)"""
+    users.clear()
+    api_keys.clear()
+    for i in range(n):
+        username = f'user{i}'
+        users[username] = {'password': 'not-a-real-hash'}
+        set_api_key(username, str(uuid.uuid4()))
+
+
+def measure(client, api_key):
+    headers = {'x-api-key': api_key}
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        response = client.get('/bench', headers=headers)
+        assert response.status_code == 200
+    return (time.perf_counter() - start) / REQUESTS
+
+
+if __name__ == '__main__':
+    client = app.test_client()
+    print(f"{'keys':>10} | {'avg latency':>12}")
+    print('-' * 26)
+    for n in SIZES:
+        seed(n)
+        # Use the most recently registered key: worst case for a linear scan
+        last_key = users[f'user{n - 1}']['api_key']
+        print(f"{n:>10} | {measure(client, last_key) * 1e6:>9.1f} us")
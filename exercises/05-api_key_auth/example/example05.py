@@ -15,6 +15,20 @@ users = {
     # }
 }
 
+# Reverse index: api_key -> username
+# Lets the API key decorator find the owner of a key with a single dict lookup
+# instead of scanning every user. Always update it through set_api_key().
+api_keys = {}
+
+
+def set_api_key(username, api_key):
+    """Assign an API key to a user, keeping the api_keys index in sync"""
+    old_key = users[username].get('api_key')
+    if old_key is not None:
+        api_keys.pop(old_key, None)
+    users[username]['api_key'] = api_key
+    api_keys[api_key] = username
+
 
 # ============================================================================
 # BASIC AUTH VERIFICATION (for API key retrieval only)
@@ -48,11 +62,10 @@ def api_key_required(f):
         if not api_key:
             return jsonify({'error': 'API key missing', 'message': 'Include x-api-key header'}), 401
 
-        # Verify if the API key exists in our users database
-        for username, user_data in users.items():
-            if user_data.get('api_key') == api_key:
-                # API key is valid, call the protected function
-                return f(*args, **kwargs)
+        # Verify if the API key exists in our users database (O(1) index lookup)
+        if api_key in api_keys:
+            # API key is valid, call the protected function
+            return f(*args, **kwargs)
 
         # API key not found in database
         return jsonify({'error': 'Invalid API key', 'message': 'API key not recognized'}), 401
@@ -86,9 +99,9 @@ def register():
 
     # Store user with hashed password and API key
     users[username] = {
-        'password': generate_password_hash(password),
-        'api_key': api_key
+        'password': generate_password_hash(password)
     }
+    set_api_key(username, api_key)
 
     return jsonify({
         'message': 'User registered successfully',
@@ -119,6 +132,25 @@ def get_api_key():
     }), 200
 
 
+@app.route('/api-key/rotate', methods=['POST'])
+@auth.login_required
+def rotate_api_key():
+    """
+    Replace your API key with a new one - Protected by Basic Auth
+
+    The old key stops working immediately.
+    """
+    current_user = auth.current_user()
+    api_key = str(uuid.uuid4())
+    set_api_key(current_user, api_key)
+
+    return jsonify({
+        'message': 'API key rotated successfully',
+        'username': current_user,
+        'api_key': api_key
+    }), 200
+
+
 # ============================================================================
 # API KEY PROTECTED ENDPOINTS (the main pattern to learn)
 # ============================================================================
@@ -160,6 +192,7 @@ if __name__ == '__main__':
     print("  POST /register  - Register new user, receive API key")
     print("\nBasic Auth protected endpoints:")
     print("  GET  /api-key   - Retrieve your API key (requires username:password)")
+    print("  POST /api-key/rotate - Replace your API key (requires username:password)")
     print("\nAPI Key protected endpoints:")
     print("  GET  /users     - List all users (requires x-api-key header)")
     print("\nExamples:")
@@ -1,6 +1,14 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+import flask_jwt_extended
+from collections import OrderedDict
+from itertools import islice
+import hashlib
+import json
+import os
+import threading
+import time
 
 app = Flask(__name__)
 
@@ -12,14 +20,206 @@ app.config['JWT_SECRET_KEY'] = 'your_jwt_secret_key'  # TODO: Change this to a s
 # Optional: Set token expiration time (default is 15 minutes)
 # app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=1)
 
+# ==================== Signing Keys ====================
+#
+# HS256 (the default) signs and verifies with JWT_SECRET_KEY. Set JWT_ALGORITHM
+# to an asymmetric algorithm (RS256, ES256, EdDSA...) to sign with a private
+# key and verify with public keys, so other services can check tokens without
+# being able to mint them (needs `pip install cryptography`):
+#   JWT_PRIVATE_KEY_FILE  - PEM private key that signs new tokens
+#   JWT_KEY_ID            - 'kid' header written into new tokens
+#   JWT_PUBLIC_KEY_FILES  - extra PEM public keys that are still accepted, e.g.
+#                           the previous key during a rotation (kid = file name),
+#                           separated by os.pathsep
+# Keys are parsed once at startup: loading a PEM costs more than checking a
+# signature, so it must not happen per request.
+JWT_ALGORITHM = os.environ.get('JWT_ALGORITHM', 'HS256')
+JWT_KEY_ID = os.environ.get('JWT_KEY_ID', 'primary')
+public_keys = {}
+
+
+def load_signing_keys():
+    """Load the private key and fill public_keys (kid -> public key object)"""
+    from cryptography.hazmat.primitives import serialization
+
+    with open(os.environ['JWT_PRIVATE_KEY_FILE'], 'rb') as f:
+        private_key = serialization.load_pem_private_key(f.read(), password=None)
+    public_keys[JWT_KEY_ID] = private_key.public_key()
+
+    for path in filter(None, os.environ.get('JWT_PUBLIC_KEY_FILES', '').split(os.pathsep)):
+        kid = os.path.splitext(os.path.basename(path))[0]
+        with open(path, 'rb') as f:
+            public_keys[kid] = serialization.load_pem_public_key(f.read())
+    return private_key
+
+
+if not JWT_ALGORITHM.startswith('HS'):
+    app.config['JWT_ALGORITHM'] = JWT_ALGORITHM
+    app.config['JWT_PRIVATE_KEY'] = load_signing_keys()
+
+
+# ==================== Verified Token Cache ====================
+#
+# A JWT never changes: once its signature and claims have been checked, the
+# same token string verifies the same way until it expires. Clients send the
+# same bearer token on every request, so the decoded claims are kept (keyed
+# by a SHA-256 digest of the token, never the token itself) until the token's
+# 'exp' and reused instead of parsing and verifying the token again.
+JWT_CACHE_SIZE = int(os.environ.get('JWT_CACHE_SIZE', 10_000))
+JWT_CACHE_MAX_TTL = float(os.environ.get('JWT_CACHE_MAX_TTL', 300))
+# The cache overrides JWTManager._decode_jwt_from_config, which is private:
+# only enable it on the flask-jwt-extended release pinned in requirements.txt
+JWT_CACHE_LIBRARY_VERSION = '4.6.'
+
+
+class CachingJWTManager(JWTManager):
+    """
+    JWTManager that remembers the claims of tokens it has already verified.
+
+    Entries expire at the token's 'exp' or after max_ttl, whichever comes
+    first, and the least recently used entry is evicted past max_size.
+    Decodes that allow expired tokens or check a CSRF value always take the
+    full path. max_size=0 disables the cache.
+    """
+
+    def __init__(self, app=None, max_size=JWT_CACHE_SIZE, max_ttl=JWT_CACHE_MAX_TTL, **kwargs):
+        if max_size and not flask_jwt_extended.__version__.startswith(JWT_CACHE_LIBRARY_VERSION):
+            raise RuntimeError(
+                f'CachingJWTManager was written against flask-jwt-extended {JWT_CACHE_LIBRARY_VERSION}x, '
+                f'found {flask_jwt_extended.__version__}: check _decode_jwt_from_config '
+                'or set JWT_CACHE_SIZE=0')
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self._verified = OrderedDict()
+        self._verified_lock = threading.Lock()
+        super().__init__(app, **kwargs)
+
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        if not self.max_size or csrf_value is not None or allow_expired:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        digest = hashlib.sha256(encoded_token.encode()).digest()
+        now = time.time()
+        with self._verified_lock:
+            entry = self._verified.get(digest)
+            if entry is not None:
+                claims, expires_at = entry
+                if now < expires_at:
+                    self._verified.move_to_end(digest)
+                    return dict(claims)
+                del self._verified[digest]
+
+        # Raises for bad signatures and expired tokens, which are never cached
+        claims = super()._decode_jwt_from_config(encoded_token)
+        expires_at = min(claims.get('exp', now + self.max_ttl), now + self.max_ttl)
+        with self._verified_lock:
+            self._verified[digest] = (claims, expires_at)
+            while len(self._verified) > self.max_size:
+                self._verified.popitem(last=False)
+        return dict(claims)
+
+    def clear_token_cache(self):
+        """Forget every verified token (e.g. after rotating the signing key)"""
+        with self._verified_lock:
+            self._verified.clear()
+
+
 jwt = _____  # TODO: Initialize JWTManager with the app
-# Hint: JWTManager(app)
+# Hint: CachingJWTManager(app) (a JWTManager with the verified token cache above)
+
+if public_keys:
+    @jwt.additional_headers_loader
+    def add_key_id(identity):
+        return {'kid': JWT_KEY_ID}
+
+    @jwt.decode_key_loader
+    def find_public_key(jwt_header, jwt_data):
+        # An unknown kid falls back to the current key, so the signature check fails
+        return public_keys.get(jwt_header.get('kid'), public_keys[JWT_KEY_ID])
+
 
 # Simulated database to store users
 users = {
     # 'username': {'password': 'hashed_password'}
 }
 
+
+def iter_usernames():
+    """
+    Usernames read lazily, for streaming. Users are only ever added, at the
+    end of the dict, so when a registration interrupts the iteration
+    (RuntimeError: dictionary changed size) it resumes after the names
+    already read instead of copying every key up front.
+    """
+    position = 0
+    while True:
+        try:
+            for username in islice(users, position, None):
+                position += 1
+                yield username
+            return
+        except RuntimeError:
+            continue
+
+# ==================== Streaming Responses ====================
+#
+# Large listings are streamed STREAM_CHUNK_SIZE items at a time, as a JSON array or NDJSON.
+STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', 1000))
+
+
+def to_json(obj):
+    return app.json.dumps(obj, separators=(',', ':'))
+
+
+def json_encoder():
+    # Same options as jsonify (sorted keys, ASCII, dates...), compact
+    return json.JSONEncoder(default=app.json.default, ensure_ascii=app.json.ensure_ascii,
+                            sort_keys=app.json.sort_keys, separators=(',', ':'))
+
+
+def wants_ndjson():
+    best = request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson'])
+    return best == 'application/x-ndjson'
+
+
+def iter_chunks(items, chunk_size=STREAM_CHUNK_SIZE):
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_json_array(items):
+    encode = json_encoder().encode
+    yield '['
+    separator = ''
+    for chunk in iter_chunks(items):
+        # One encode() per chunk keeps the per-item work in the C encoder
+        yield separator + encode(chunk)[1:-1]
+        separator = ','
+    yield ']'
+
+
+def iter_ndjson(items):
+    encode = json_encoder().encode
+    for chunk in iter_chunks(items):
+        yield '\n'.join(map(encode, chunk)) + '\n'
+
+
+def stream_items(items, key, before):
+    """Response streaming {**before, key: [items]}, or only the items as NDJSON if the client asks"""
+    if wants_ndjson():
+        return Response(iter_ndjson(items), mimetype='application/x-ndjson')
+
+    def body():
+        yield '{' + to_json(before)[1:-1] + ',' + to_json(key) + ':'
+        yield from iter_json_array(items)
+        yield '}'
+
+    return Response(body(), mimetype='application/json')
+
 # ============================================================================
 # PUBLIC ENDPOINTS (No authentication required)
 # ============================================================================
@@ -134,10 +334,7 @@ def get_users():
     current_user = _____  # TODO: Get JWT identity
     # Hint: Use get_jwt_identity()
 
-    return jsonify({
-        'users': list(users.keys()),
-        'requested_by': current_user
-    }), 200
+    return stream_items(iter_usernames(), key='users', before={'requested_by': current_user}), 200
 
 
 @app.route('/protected', methods=['GET'])
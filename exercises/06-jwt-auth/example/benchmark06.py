@@ -0,0 +1,95 @@
+"""
+Benchmark: tokens verified per second on GET /profile
+
+For every signing algorithm the same bearer token is verified REQUESTS times,
+first with the verified token cache disabled (every request parses the token
+and checks its signature) and then enabled (only the first request does).
+Two numbers are reported: decode_token() calls per second, which isolates the
+verification path, and full GET /profile requests per second.
+
+Each algorithm runs in its own process because example06 reads JWT_ALGORITHM
+when it is imported. Asymmetric algorithms need `pip install cryptography`.
+
+Run:
+    python benchmark06.py
+"""
+import multiprocessing
+import os
+import tempfile
+import time
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+
+REQUESTS = 5_000
+ALGORITHMS = {
+    'HS256': None,
+    'RS256': lambda: rsa.generate_private_key(public_exponent=65537, key_size=2048),
+    'ES256': lambda: ec.generate_private_key(ec.SECP256R1()),
+    'EdDSA': ed25519.Ed25519PrivateKey.generate,
+}
+
+
+def write_key(directory, algorithm, generate):
+    path = os.path.join(directory, f'{algorithm}.pem')
+    with open(path, 'wb') as f:
+        f.write(generate().private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ))
+    return path
+
+
+def rate(fn):
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        fn()
+    return REQUESTS / (time.perf_counter() - start)
+
+
+def measure(algorithm, key_file, results):
+    """Runs in a child process: configure the algorithm, then import the app"""
+    os.environ['JWT_ALGORITHM'] = algorithm
+    if key_file:
+        os.environ['JWT_PRIVATE_KEY_FILE'] = key_file
+
+    from flask_jwt_extended import create_access_token, decode_token
+    from example06 import app, jwt, JWT_CACHE_SIZE
+
+    client = app.test_client()
+    with app.app_context():
+        token = create_access_token(identity='bench')
+    headers = {'Authorization': f'Bearer {token}'}
+
+    def request_profile():
+        response = client.get('/profile', headers=headers)
+        assert response.status_code == 200
+
+    row = [algorithm]
+    for max_size in (0, JWT_CACHE_SIZE):
+        jwt.max_size = max_size
+        jwt.clear_token_cache()
+        with app.app_context():
+            row.append(rate(lambda: decode_token(token)))
+        row.append(rate(request_profile))
+    results.put(row)
+
+
+if __name__ == '__main__':
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+
+    print(f"{REQUESTS:,} verifications of the same token per run")
+    print(f"{'algorithm':>9} | {'decode/s off':>12} | {'decode/s on':>12} | "
+          f"{'/profile off':>12} | {'/profile on':>12}")
+    print('-' * 71)
+    with tempfile.TemporaryDirectory() as directory:
+        for algorithm, generate in ALGORITHMS.items():
+            key_file = write_key(directory, algorithm, generate) if generate else None
+            process = ctx.Process(target=measure, args=(algorithm, key_file, results))
+            process.start()
+            name, decode_off, profile_off, decode_on, profile_on = results.get()
+            process.join()
+            print(f"{name:>9} | {decode_off:>12,.0f} | {decode_on:>12,.0f} | "
+                  f"{profile_off:>12,.0f} | {profile_on:>12,.0f}")
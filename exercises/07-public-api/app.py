@@ -1,7 +1,14 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
 import requests
+from requests.adapters import HTTPAdapter
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+import json
+import os
+import threading
+import time
 
 app = Flask(__name__)
 
@@ -19,8 +26,88 @@ users = {
 # OpenWeatherMap Configuration
 # TODO: Get your free API key from https://openweathermap.org/api
 OPENWEATHER_API_KEY = 'YOUR_API_KEY_HERE'  # Replace with your actual API key
-GEOCODING_API_URL = 'https://api.openweathermap.org/geo/1.0/direct'
-WEATHER_API_URL = 'https://api.openweathermap.org/data/2.5/weather'
+# OPENWEATHER_BASE_URL lets you point the app at a local stand-in (see example/stub_upstream07.py)
+OPENWEATHER_BASE_URL = os.environ.get('OPENWEATHER_BASE_URL', 'https://api.openweathermap.org')
+GEOCODING_API_URL = f'{OPENWEATHER_BASE_URL}/geo/1.0/direct'
+WEATHER_API_URL = f'{OPENWEATHER_BASE_URL}/data/2.5/weather'
+
+# Shared HTTP session: reuses pooled TCP/TLS connections to OpenWeatherMap
+# instead of opening a new connection for every upstream call
+HTTP_TIMEOUT = 10  # seconds
+http = requests.Session()
+http.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=32))
+http.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=32))
+
+# Caches for upstream results
+# A city's coordinates practically never change, so geocoding results are kept
+# for a day. Weather is only cached briefly, keyed by coordinates.
+CACHE_ENABLED = os.environ.get('WEATHER_CACHE', '1') != '0'
+GEOCODING_CACHE_TTL = 24 * 60 * 60  # seconds
+WEATHER_CACHE_TTL = 60  # seconds
+
+
+class TTLCache:
+    """
+    Small thread-safe cache whose entries expire after `ttl` seconds.
+
+    Concurrent misses for the same key are coalesced: the first caller runs
+    the loader and the others wait for its result (or its exception) instead
+    of making their own upstream call.
+    """
+
+    def __init__(self, ttl, max_size=10_000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._inflight = {}  # key -> Future
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key, loader):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                return entry[0]
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = loader()
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            with self._lock:
+                self._entries[key] = (value, time.monotonic() + self.ttl)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+geocoding_cache = TTLCache(GEOCODING_CACHE_TTL)
+weather_cache = TTLCache(WEATHER_CACHE_TTL)
+
+
+class WeatherError(Exception):
+    """An upstream failure, carrying the JSON error body and HTTP status to return"""
+
+    def __init__(self, payload, status_code):
+        super().__init__(payload.get('error'))
+        self.payload = payload
+        self.status_code = status_code
 
 
 # ============================================================================
@@ -103,41 +190,13 @@ def profile():
 # EXTERNAL API CONSUMPTION - WEATHER ENDPOINTS
 # ============================================================================
 
-@app.route('/weather', methods=['GET'])
-def weather():
+def fetch_coordinates(city, country_code):
     """
-    Get weather information for a city - Public endpoint
-
-    This endpoint demonstrates consuming MULTIPLE external APIs:
-    1. OpenWeatherMap Geocoding API: Convert city name to coordinates
-    2. OpenWeatherMap Current Weather API: Get weather by coordinates
-
-    Query Parameters:
-        city (str): City name (default: 'Madrid')
-        country (str): Optional ISO 3166 country code (e.g., 'ES', 'US')
-
-    Returns:
-        JSON with weather information or error message
+    STEP 1: Get coordinates from city name using the Geocoding API.
 
-    Note: This endpoint is PUBLIC (no JWT required) because the focus
-    is on learning to consume external APIs, not authentication.
+    Returns a dict with latitude, longitude, name, country and state.
+    Raises WeatherError if the city cannot be resolved.
     """
-    # Get parameters from query string
-    city = request.args.get('city', 'Madrid')
-    country_code = request.args.get('country', '')  # Optional country code
-
-    # Validate API key is configured
-    if OPENWEATHER_API_KEY == 'YOUR_API_KEY_HERE':
-        return jsonify({
-            'error': 'OpenWeatherMap API key not configured',
-            'message': 'Please set OPENWEATHER_API_KEY in app.py',
-            'help': 'Get a free API key at https://openweathermap.org/api'
-        }), 500
-
-    # ========================================================================
-    # STEP 1: Get coordinates from city name using Geocoding API
-    # ========================================================================
-
     # Build the geocoding query
     # Format: "CityName,CountryCode" (country code is optional but recommended)
     query = f"{city},{country_code}" if country_code else city
@@ -148,17 +207,17 @@ def weather():
 
     # Make request to Geocoding API
     try:
-        # TODO: Make GET request to geocoding API
-        # Hint: Use requests.get(geocoding_url)
-        geo_response = _____(geocoding_url)
+        # TODO: Make GET request to geocoding API (through the shared session)
+        # Hint: Use http.get(geocoding_url, timeout=HTTP_TIMEOUT)
+        geo_response = _____(geocoding_url, timeout=HTTP_TIMEOUT)
 
         # Check if the request was successful
         if geo_response.status_code != 200:
-            return jsonify({
+            raise WeatherError({
                 'error': 'Geocoding API request failed',
                 'status_code': geo_response.status_code,
                 'message': 'Could not connect to OpenWeatherMap Geocoding API'
-            }), 502
+            }, 502)
 
         # TODO: Parse JSON response from geocoding API
         # Hint: Use geo_response.json()
@@ -166,68 +225,103 @@ def weather():
 
         # Check if city was found
         if not geo_data or len(geo_data) == 0:
-            return jsonify({
+            raise WeatherError({
                 'error': 'City not found',
                 'message': f'Could not find coordinates for city: {city}',
                 'suggestion': 'Try adding a country code, e.g., ?city=Paris&country=FR'
-            }), 404
-
-        # Extract coordinates from first result
-        # TODO: Get latitude from geocoding response
-        # Hint: geo_data[0]['lat']
-        latitude = _____
-
-        # TODO: Get longitude from geocoding response
-        # Hint: geo_data[0]['lon']
-        longitude = _____
-
-        # Get additional location info
-        location_name = geo_data[0].get('name', city)
-        country = geo_data[0].get('country', 'Unknown')
-        state = geo_data[0].get('state', '')  # Some locations have state info
+            }, 404)
+
+        # Extract coordinates and additional location info from first result
+        return {
+            # TODO: Get latitude and longitude from geocoding response
+            # Hint: geo_data[0]['lat'] and geo_data[0]['lon']
+            'latitude': _____,
+            'longitude': _____,
+            'name': geo_data[0].get('name', city),
+            'country': geo_data[0].get('country', 'Unknown'),
+            'state': geo_data[0].get('state', '')  # Some locations have state info
+        }
 
     except requests.exceptions.RequestException as e:
-        return jsonify({
+        raise WeatherError({
             'error': 'Network error',
             'message': f'Could not connect to Geocoding API: {str(e)}'
-        }), 502
+        }, 502)
     except (KeyError, IndexError, ValueError) as e:
-        return jsonify({
+        raise WeatherError({
             'error': 'Invalid response from Geocoding API',
             'message': str(e)
-        }), 502
+        }, 502)
 
-    # ========================================================================
-    # STEP 2: Get weather data using coordinates
-    # ========================================================================
 
+def fetch_current_weather(latitude, longitude):
+    """
+    STEP 2: Get weather data using coordinates.
+
+    Returns the raw JSON from the Current Weather API.
+    Raises WeatherError on upstream failures.
+    """
     # TODO: Build the weather API URL with coordinates and API key
     # Hint: Use WEATHER_API_URL, add parameters: lat={latitude}, lon={longitude},
     #       appid={OPENWEATHER_API_KEY}, units=metric, lang=en
     weather_url = f'{WEATHER_API_URL}?lat={_____}&lon={_____}&appid={_____}&units=metric&lang=en'
 
     try:
-        # TODO: Make GET request to weather API
-        # Hint: Use requests.get(weather_url)
-        weather_response = _____(weather_url)
+        # TODO: Make GET request to weather API (through the shared session)
+        # Hint: Use http.get(weather_url, timeout=HTTP_TIMEOUT)
+        weather_response = _____(weather_url, timeout=HTTP_TIMEOUT)
 
         if weather_response.status_code != 200:
-            return jsonify({
+            raise WeatherError({
                 'error': 'Weather API request failed',
                 'status_code': weather_response.status_code,
                 'message': 'Could not retrieve weather information'
-            }), 502
+            }, 502)
 
         # TODO: Parse JSON response from weather API
         # Hint: Use weather_response.json()
-        weather_data = _____()
+        return _____()
 
-        # Extract relevant weather information
-        weather_info = {
+    except requests.exceptions.RequestException as e:
+        raise WeatherError({
+            'error': 'Network error',
+            'message': f'Could not connect to Weather API: {str(e)}'
+        }, 502)
+    except ValueError as e:
+        raise WeatherError({
+            'error': 'Invalid response from Weather API',
+            'message': str(e)
+        }, 502)
+
+
+def get_city_weather(city, country_code=''):
+    """
+    Resolve a city and return its current weather as the /weather JSON body.
+
+    Both upstream calls go through the TTL caches (unless CACHE_ENABLED is
+    off), so repeated and concurrent lookups for the same city are cheap.
+    Raises WeatherError with the JSON error body and status code on failure.
+    """
+    if CACHE_ENABLED:
+        location = geocoding_cache.get_or_load(
+            (city.lower(), country_code.lower()),
+            lambda: fetch_coordinates(city, country_code))
+        latitude, longitude = location['latitude'], location['longitude']
+        weather_data = weather_cache.get_or_load(
+            (latitude, longitude),
+            lambda: fetch_current_weather(latitude, longitude))
+    else:
+        location = fetch_coordinates(city, country_code)
+        latitude, longitude = location['latitude'], location['longitude']
+        weather_data = fetch_current_weather(latitude, longitude)
+
+    # Extract relevant weather information
+    try:
+        return {
             'location': {
-                'city': location_name,
-                'country': country,
-                'state': state,
+                'city': location['name'],
+                'country': location['country'],
+                'state': location['state'],
                 'coordinates': {
                     'latitude': latitude,
                     'longitude': longitude
@@ -248,19 +342,119 @@ def weather():
             },
             'timestamp': weather_data['dt']
         }
+    except (KeyError, IndexError, TypeError) as e:
+        raise WeatherError({
+            'error': 'Invalid response from Weather API',
+            'message': str(e)
+        }, 502)
 
-        return jsonify(weather_info), 200
 
-    except requests.exceptions.RequestException as e:
+@app.route('/weather', methods=['GET'])
+def weather():
+    """
+    Get weather information for a city - Public endpoint
+
+    This endpoint demonstrates consuming MULTIPLE external APIs:
+    1. OpenWeatherMap Geocoding API: Convert city name to coordinates
+    2. OpenWeatherMap Current Weather API: Get weather by coordinates
+
+    Query Parameters:
+        city (str): City name (default: 'Madrid')
+        country (str): Optional ISO 3166 country code (e.g., 'ES', 'US')
+
+    Returns:
+        JSON with weather information or error message
+
+    Note: This endpoint is PUBLIC (no JWT required) because the focus
+    is on learning to consume external APIs, not authentication.
+    """
+    # Get parameters from query string
+    city = request.args.get('city', 'Madrid')
+    country_code = request.args.get('country', '')  # Optional country code
+
+    # Validate API key is configured
+    if OPENWEATHER_API_KEY == 'YOUR_API_KEY_HERE':
         return jsonify({
-            'error': 'Network error',
-            'message': f'Could not connect to Weather API: {str(e)}'
-        }), 502
-    except (KeyError, ValueError) as e:
+            'error': 'OpenWeatherMap API key not configured',
+            'message': 'Please set OPENWEATHER_API_KEY in app.py',
+            'help': 'Get a free API key at https://openweathermap.org/api'
+        }), 500
+
+    try:
+        return jsonify(get_city_weather(city, country_code)), 200
+    except WeatherError as e:
+        return jsonify(e.payload), e.status_code
+
+
+# Batch lookups: how many cities are resolved at the same time (across all
+# batch requests, they share one pool), and the maximum number of cities
+# accepted in one request
+BATCH_CONCURRENCY = 16
+BATCH_MAX_CITIES = 500
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY, thread_name_prefix='weather-batch')
+
+
+@app.route('/weather/batch', methods=['POST'])
+def weather_batch():
+    """
+    Get weather information for many cities at once - Public endpoint
+
+    Cities are resolved concurrently (at most BATCH_CONCURRENCY at a time across
+    all batch requests) and each result is streamed as soon as it is ready, one
+    JSON object per line (NDJSON), so results do NOT come back in request order.
+
+    Request Body (JSON):
+        cities (list): City names, or objects like {"city": "Paris", "country": "FR"}
+
+    Returns:
+        200: NDJSON stream. Each line has 'city', 'country' and 'status'; on
+             success 'weather' holds the same body as GET /weather, otherwise
+             'error' holds the same error body GET /weather would return
+        400: Invalid request body
+        500: API key not configured
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('cities'), list):
+        return jsonify({'error': 'Request body must be JSON with a "cities" list'}), 400
+
+    cities = []
+    for item in data['cities']:
+        if isinstance(item, str):
+            item = {'city': item}
+        if not isinstance(item, dict) or not isinstance(item.get('city'), str) or not item['city']:
+            return jsonify({'error': 'Each city must be a name or an object with a "city" field'}), 400
+        country = item.get('country')
+        cities.append((item['city'], '' if country is None else str(country)))
+
+    if len(cities) > BATCH_MAX_CITIES:
+        return jsonify({'error': f'At most {BATCH_MAX_CITIES} cities per request'}), 400
+
+    if OPENWEATHER_API_KEY == 'YOUR_API_KEY_HERE':
         return jsonify({
-            'error': 'Invalid response from Weather API',
-            'message': str(e)
-        }), 502
+            'error': 'OpenWeatherMap API key not configured',
+            'message': 'Please set OPENWEATHER_API_KEY in app.py',
+            'help': 'Get a free API key at https://openweathermap.org/api'
+        }), 500
+
+    def lookup(city, country_code):
+        line = {'city': city, 'country': country_code}
+        try:
+            line.update(status=200, weather=get_city_weather(city, country_code))
+        except WeatherError as e:
+            line.update(status=e.status_code, error=e.payload)
+        return json.dumps(line) + '\n'
+
+    def generate():
+        futures = [batch_executor.submit(lookup, city, country_code) for city, country_code in cities]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # Drop this request's pending lookups if the client goes away mid-stream
+            for future in futures:
+                future.cancel()
+
+    return Response(generate(), mimetype='application/x-ndjson'), 200
 
 
 # ============================================================================
@@ -289,6 +483,7 @@ if __name__ == '__main__':
     print("  GET  /profile   - Get user profile (requires JWT)")
     print("\nWeather endpoint (public - no auth required):")
     print("  GET  /weather?city=CityName&country=CountryCode")
+    print("  POST /weather/batch  - Many cities at once, streamed as NDJSON")
     print("\nExamples:")
     print("  curl http://127.0.0.1:5000/weather?city=Madrid")
     print("  curl http://127.0.0.1:5000/weather?city=Paris&country=FR")
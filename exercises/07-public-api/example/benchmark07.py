@@ -0,0 +1,67 @@
+"""
+Benchmark: /weather latency with and without the upstream caches
+
+Starts stub_upstream07.py in a background thread, points example07.py at it
+and sends the same mix of city lookups from several client threads. Reports
+p50/p99 latency and how many upstream calls were made.
+
+Run:
+    python benchmark07.py
+"""
+import logging
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import make_server
+
+import stub_upstream07
+
+STUB_PORT = 5081
+os.environ['OPENWEATHER_BASE_URL'] = f'http://127.0.0.1:{STUB_PORT}'
+
+import example07  # noqa: E402  (must be imported after OPENWEATHER_BASE_URL is set)
+
+CITIES = ['Madrid', 'Paris', 'London', 'Berlin', 'Rome', 'Lisbon', 'Vienna', 'Oslo']
+REQUESTS = 400
+CLIENT_THREADS = 16
+
+
+def run(cache_enabled):
+    example07.CACHE_ENABLED = cache_enabled
+    example07.geocoding_cache.clear()
+    example07.weather_cache.clear()
+    for endpoint in stub_upstream07.request_counts:
+        stub_upstream07.request_counts[endpoint] = 0
+
+    client = example07.app.test_client()
+
+    def one(i):
+        start = time.perf_counter()
+        response = client.get(f'/weather?city={CITIES[i % len(CITIES)]}')
+        assert response.status_code == 200, response.get_json()
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(CLIENT_THREADS) as pool:
+        latencies = sorted(pool.map(one, range(REQUESTS)))
+
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    upstream = sum(stub_upstream07.request_counts.values())
+    label = 'cache on ' if cache_enabled else 'cache off'
+    print(f"{label} | p50 {p50:8.2f} ms | p99 {p99:8.2f} ms | upstream calls {upstream}")
+
+
+if __name__ == '__main__':
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', STUB_PORT, stub_upstream07.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    example07.OPENWEATHER_API_KEY = 'stub'
+
+    print(f"{REQUESTS} requests, {CLIENT_THREADS} client threads, "
+          f"{stub_upstream07.UPSTREAM_LATENCY * 1000:.0f} ms upstream latency")
+    run(cache_enabled=False)
+    run(cache_enabled=True)
+    server.shutdown()
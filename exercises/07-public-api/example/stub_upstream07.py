@@ -0,0 +1,64 @@
+"""
+Local stand-in for the OpenWeatherMap Geocoding and Current Weather APIs
+
+Serves deterministic fake data with a configurable artificial latency, so the
+weather endpoints can be exercised and benchmarked offline.
+
+Run:
+    python stub_upstream07.py            # listens on http://127.0.0.1:5001
+    OPENWEATHER_BASE_URL=http://127.0.0.1:5001 python example07.py
+"""
+import threading
+import time
+import zlib
+
+from flask import Flask, jsonify, request
+
+app = Flask(__name__)
+
+# Artificial latency added to every response (seconds)
+UPSTREAM_LATENCY = 0.05
+
+# Number of requests served per endpoint (read by the benchmarks)
+request_counts = {'geocoding': 0, 'weather': 0}
+_counts_lock = threading.Lock()
+
+
+def _count(endpoint):
+    with _counts_lock:
+        request_counts[endpoint] += 1
+
+
+@app.route('/geo/1.0/direct', methods=['GET'])
+def geocoding():
+    _count('geocoding')
+    time.sleep(UPSTREAM_LATENCY)
+    city, _, country = request.args.get('q', '').partition(',')
+    if not city or city.lower().startswith('nowhere'):
+        return jsonify([]), 200
+
+    # Derive stable coordinates from the city name
+    seed = zlib.crc32(city.lower().encode())
+    return jsonify([{
+        'name': city.title(),
+        'lat': round((seed % 18000) / 100 - 90, 4),
+        'lon': round((seed // 18000 % 36000) / 100 - 180, 4),
+        'country': country.upper() or 'XX'
+    }]), 200
+
+
+@app.route('/data/2.5/weather', methods=['GET'])
+def current_weather():
+    _count('weather')
+    time.sleep(UPSTREAM_LATENCY)
+    lat = request.args.get('lat', type=float)
+    return jsonify({
+        'main': {'temp': round(30 - abs(lat or 0) / 3, 1), 'feels_like': 20.0, 'humidity': 50, 'pressure': 1013},
+        'weather': [{'description': 'clear sky', 'main': 'Clear', 'icon': '01d'}],
+        'wind': {'speed': 3.5, 'deg': 180},
+        'dt': int(time.time())
+    }), 200
+
+
+if __name__ == '__main__':
+    app.run(port=5001, threaded=True)
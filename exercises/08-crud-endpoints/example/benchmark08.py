@@ -0,0 +1,73 @@
+"""
+Benchmark: user repositories under a mixed read/write workload
+
+Seeds SEED users, then THREADS threads run OPERATIONS repository calls
+between them: 90% get (what every Basic-auth login does), 5% add and
+5% set_password. Compared:
+- dict:                 DictUserRepository
+- sqlite:               SQLiteUserRepository (WAL, pooled connections)
+- sqlite, no pool:      the same with pool_size=0, i.e. a new connection
+                        (and freshly prepared statements) for every call
+The password hashes are fixed strings: hashing would dwarf the storage.
+
+Run:
+    python benchmark08.py
+"""
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from example08 import DictUserRepository, SQLiteUserRepository
+
+SEED = 100_000
+OPERATIONS = 40_000
+THREADS = [1, 8]
+PASSWORD_HASH = 'scrypt:32768:8:1$benchmark$' + '0' * 128
+
+
+def seed(repository):
+    for i in range(SEED):
+        repository.add(f'user{i}', {'password': PASSWORD_HASH})
+
+
+def workload(repository, worker, operations):
+    rng = random.Random(worker)
+    for i in range(operations):
+        roll = rng.random()
+        if roll < 0.90:
+            assert repository.get(f'user{rng.randrange(SEED)}') is not None
+        elif roll < 0.95:
+            repository.add(f'new{worker}-{i}', {'password': PASSWORD_HASH})
+        else:
+            repository.set_password(f'user{rng.randrange(SEED)}', PASSWORD_HASH)
+
+
+def operations_per_second(repository, threads):
+    per_thread = OPERATIONS // threads
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(lambda worker: workload(repository, worker, per_thread), range(threads)))
+    return per_thread * threads / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as directory:
+        repositories = {
+            'dict': lambda threads: DictUserRepository(),
+            'sqlite': lambda threads: SQLiteUserRepository(os.path.join(directory, f'pool{threads}.sqlite3')),
+            'sqlite, no pool': lambda threads: SQLiteUserRepository(
+                os.path.join(directory, f'nopool{threads}.sqlite3'), pool_size=0),
+        }
+
+        print(f"{SEED:,} users, {OPERATIONS:,} operations (90% get, 5% add, 5% set_password)")
+        print(f"{'repository':<16} | " + ' | '.join(f'{n:>2} threads' for n in THREADS))
+        print('-' * (19 + 13 * len(THREADS)))
+        for label, create in repositories.items():
+            rates = []
+            for threads in THREADS:
+                repository = create(threads)
+                seed(repository)
+                rates.append(operations_per_second(repository, threads))
+            print(f"{label:<16} | " + ' | '.join(f'{rate:>8,.0f}/s' for rate in rates))
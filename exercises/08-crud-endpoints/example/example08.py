@@ -1,7 +1,19 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_httpauth import HTTPBasicAuth
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+import flask_jwt_extended
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from itertools import islice
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
 
 app = Flask(__name__)
 auth = HTTPBasicAuth()
@@ -10,14 +22,317 @@ auth = HTTPBasicAuth()
 # WARNING: In production, use environment variables for secrets!
 # Example: app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY')
 app.config['JWT_SECRET_KEY'] = 'super_secret_jwt_key'  # Only for educational purposes
-jwt = JWTManager(app)
 
-# Simulated database to store users
-users = {}
+# ==================== Verified Token Cache ====================
+#
+# A JWT never changes: once its signature and claims have been checked, the
+# same token string verifies the same way until it expires. Clients send the
+# same bearer token on every request, so the decoded claims are kept (keyed
+# by a SHA-256 digest of the token, never the token itself) until the token's
+# 'exp' and reused instead of parsing and verifying the token again.
+JWT_CACHE_SIZE = int(os.environ.get('JWT_CACHE_SIZE', 10_000))
+JWT_CACHE_MAX_TTL = float(os.environ.get('JWT_CACHE_MAX_TTL', 300))
+# The cache overrides JWTManager._decode_jwt_from_config, which is private:
+# only enable it on the flask-jwt-extended release pinned in requirements.txt
+JWT_CACHE_LIBRARY_VERSION = '4.6.'
+
+
+class CachingJWTManager(JWTManager):
+    """
+    JWTManager that remembers the claims of tokens it has already verified.
+
+    Entries expire at the token's 'exp' or after max_ttl, whichever comes
+    first, and the least recently used entry is evicted past max_size.
+    Decodes that allow expired tokens or check a CSRF value always take the
+    full path. max_size=0 disables the cache.
+    """
+
+    def __init__(self, app=None, max_size=JWT_CACHE_SIZE, max_ttl=JWT_CACHE_MAX_TTL, **kwargs):
+        if max_size and not flask_jwt_extended.__version__.startswith(JWT_CACHE_LIBRARY_VERSION):
+            raise RuntimeError(
+                f'CachingJWTManager was written against flask-jwt-extended {JWT_CACHE_LIBRARY_VERSION}x, '
+                f'found {flask_jwt_extended.__version__}: check _decode_jwt_from_config '
+                'or set JWT_CACHE_SIZE=0')
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self._verified = OrderedDict()
+        self._verified_lock = threading.Lock()
+        super().__init__(app, **kwargs)
+
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        if not self.max_size or csrf_value is not None or allow_expired:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        digest = hashlib.sha256(encoded_token.encode()).digest()
+        now = time.time()
+        with self._verified_lock:
+            entry = self._verified.get(digest)
+            if entry is not None:
+                claims, expires_at = entry
+                if now < expires_at:
+                    self._verified.move_to_end(digest)
+                    return dict(claims)
+                del self._verified[digest]
+
+        # Raises for bad signatures and expired tokens, which are never cached
+        claims = super()._decode_jwt_from_config(encoded_token)
+        expires_at = min(claims.get('exp', now + self.max_ttl), now + self.max_ttl)
+        with self._verified_lock:
+            self._verified[digest] = (claims, expires_at)
+            while len(self._verified) > self.max_size:
+                self._verified.popitem(last=False)
+        return dict(claims)
+
+    def clear_token_cache(self):
+        """Forget every verified token (e.g. after rotating the signing key)"""
+        with self._verified_lock:
+            self._verified.clear()
+
+
+jwt = CachingJWTManager(app)
+
+# ==================== User Repository ====================
+#
+# Routes go through a UserRepository instead of touching a dict directly,
+# so the storage can be swapped without changing them:
+#   USERS_STORE=dict    users in a Python dict (default; lost on restart)
+#   USERS_STORE=sqlite  users in the SQLite database at USERS_DB_PATH, which
+#                       several processes can share
+# SQLite runs in WAL mode with pooled connections, which keep their prepared statements.
+USERS_STORE = os.environ.get('USERS_STORE', 'dict')
+USERS_DB_PATH = os.environ.get('USERS_DB_PATH', 'users.sqlite3')
+SQLITE_POOL_SIZE = int(os.environ.get('SQLITE_POOL_SIZE', 8))
+SQLITE_BUSY_TIMEOUT = float(os.environ.get('SQLITE_BUSY_TIMEOUT', 5))
+
+
+class SQLiteConnectionPool:
+    """Connections checked out for one operation each and reused; at most size idle ones are kept"""
+
+    def __init__(self, path, size=SQLITE_POOL_SIZE, timeout=SQLITE_BUSY_TIMEOUT):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+
+    def _connect(self):
+        # isolation_level=None: autocommit, every statement is its own transaction
+        connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                     check_same_thread=False, cached_statements=64)
+        connection.row_factory = sqlite3.Row
+        connection.execute('PRAGMA journal_mode=WAL')
+        # Safe with WAL: a power loss can lose the last commits, never corrupt the file
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    @contextmanager
+    def connection(self):
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            connection = self._connect()
+        try:
+            yield connection
+        finally:
+            if self._idle.qsize() < self.size:
+                self._idle.put(connection)
+            else:
+                connection.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class UserRepository(ABC):
+    """Storage interface used by the routes; users are dicts like {'password': hash}"""
+
+    @abstractmethod
+    def get(self, username):
+        """The user, or None if it does not exist"""
+
+    @abstractmethod
+    def add(self, username, user):
+        """Store a new user; False if the username is taken"""
+
+    @abstractmethod
+    def set_password(self, username, password_hash):
+        """False if the user does not exist"""
+
+    @abstractmethod
+    def delete(self, username):
+        """False if the user does not exist"""
+
+    @abstractmethod
+    def usernames(self):
+        """All usernames, in registration order, read lazily (an iterator)"""
+
+    def __contains__(self, username):
+        return self.get(username) is not None
+
+
+class DictUserRepository(UserRepository):
+    """Users in a dict: no setup, used by default and in tests"""
+
+    def __init__(self):
+        self._users = {}
+        self._lock = threading.Lock()
+
+    def get(self, username):
+        user = self._users.get(username)
+        return dict(user) if user is not None else None
+
+    def add(self, username, user):
+        with self._lock:
+            if username in self._users:
+                return False
+            self._users[username] = dict(user)
+            return True
+
+    def set_password(self, username, password_hash):
+        with self._lock:
+            if username not in self._users:
+                return False
+            self._users[username]['password'] = password_hash
+            return True
+
+    def delete(self, username):
+        with self._lock:
+            return self._users.pop(username, None) is not None
+
+    def usernames(self):
+        # Copying the keys lets users register while a response is streaming
+        return iter(list(self._users))
+
+
+class SQLiteUserRepository(UserRepository):
+    """Users in a SQLite table with indexes on id and username"""
+
+    SCHEMA = [
+        'CREATE TABLE IF NOT EXISTS users ('
+        ' id INTEGER PRIMARY KEY,'
+        ' username TEXT NOT NULL,'
+        ' password TEXT NOT NULL)',
+        'CREATE UNIQUE INDEX IF NOT EXISTS users_username ON users (username)'
+    ]
+    GET = 'SELECT password FROM users WHERE username = ?'
+    ADD = 'INSERT INTO users (username, password) VALUES (?, ?)'
+    SET_PASSWORD = 'UPDATE users SET password = ? WHERE username = ?'
+    DELETE = 'DELETE FROM users WHERE username = ?'
+    USERNAMES = 'SELECT username FROM users ORDER BY id'
+
+    def __init__(self, path, pool_size=SQLITE_POOL_SIZE):
+        self.pool = SQLiteConnectionPool(path, pool_size)
+        with self.pool.connection() as connection:
+            for statement in self.SCHEMA:
+                connection.execute(statement)
+
+    def get(self, username):
+        with self.pool.connection() as connection:
+            row = connection.execute(self.GET, (username,)).fetchone()
+        return {'password': row['password']} if row is not None else None
+
+    def add(self, username, user):
+        try:
+            with self.pool.connection() as connection:
+                connection.execute(self.ADD, (username, user['password']))
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def set_password(self, username, password_hash):
+        with self.pool.connection() as connection:
+            return connection.execute(self.SET_PASSWORD, (password_hash, username)).rowcount > 0
+
+    def delete(self, username):
+        with self.pool.connection() as connection:
+            return connection.execute(self.DELETE, (username,)).rowcount > 0
+
+    def usernames(self):
+        # The connection stays checked out until the caller is done reading
+        with self.pool.connection() as connection:
+            cursor = connection.execute(self.USERNAMES)
+            try:
+                for row in cursor:
+                    yield row['username']
+            finally:
+                cursor.close()
+
+
+def create_user_repository():
+    if USERS_STORE == 'sqlite':
+        return SQLiteUserRepository(USERS_DB_PATH)
+    return DictUserRepository()
+
+
+# Database to store users (see USERS_STORE)
+users = create_user_repository()
+
+# ==================== Streaming Responses ====================
+#
+# Large listings are streamed STREAM_CHUNK_SIZE items at a time, as a JSON array or NDJSON.
+STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', 1000))
+
+
+def to_json(obj):
+    return app.json.dumps(obj, separators=(',', ':'))
+
+
+def json_encoder():
+    # Same options as jsonify (sorted keys, ASCII, dates...), compact
+    return json.JSONEncoder(default=app.json.default, ensure_ascii=app.json.ensure_ascii,
+                            sort_keys=app.json.sort_keys, separators=(',', ':'))
+
+
+def wants_ndjson():
+    best = request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson'])
+    return best == 'application/x-ndjson'
+
+
+def iter_chunks(items, chunk_size=STREAM_CHUNK_SIZE):
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_json_array(items):
+    encode = json_encoder().encode
+    yield '['
+    separator = ''
+    for chunk in iter_chunks(items):
+        # One encode() per chunk keeps the per-item work in the C encoder
+        yield separator + encode(chunk)[1:-1]
+        separator = ','
+    yield ']'
+
+
+def iter_ndjson(items):
+    encode = json_encoder().encode
+    for chunk in iter_chunks(items):
+        yield '\n'.join(map(encode, chunk)) + '\n'
+
+
+def stream_items(items, key):
+    """Response streaming {key: [items]}, or only the items as NDJSON if the client asks"""
+    if wants_ndjson():
+        return Response(iter_ndjson(items), mimetype='application/x-ndjson')
+
+    def body():
+        yield '{' + to_json(key) + ':'
+        yield from iter_json_array(items)
+        yield '}'
+
+    return Response(body(), mimetype='application/json')
 
 @auth.verify_password
 def verify_password(username, password):
-    if username in users and check_password_hash(users.get(username)['password'], password):
+    user = users.get(username)
+    if user is not None and check_password_hash(user['password'], password):
         return username
     return None
 
@@ -38,9 +353,8 @@ def register_user():
         if username in users:
             return jsonify({'message': 'User already exists.'}), 400
 
-        users[username] = {
-            'password': generate_password_hash(password)
-        }
+        if not users.add(username, {'password': generate_password_hash(password)}):
+            return jsonify({'message': 'User already exists.'}), 400
         return jsonify({'message': 'User registered successfully.'}), 201
 
     except Exception as e:
@@ -74,15 +388,14 @@ def create_user_admin():
     if username in users:
         return jsonify({'message': 'User already exists.'}), 400
 
-    users[username] = {
-        'password': generate_password_hash(password)
-    }
+    if not users.add(username, {'password': generate_password_hash(password)}):
+        return jsonify({'message': 'User already exists.'}), 400
     return jsonify({'message': 'User created successfully.'}), 201
 
 @app.route('/users', methods=['GET'])
 @jwt_required()
 def get_users():
-    return jsonify({'users': list(users.keys())}), 200
+    return stream_items(users.usernames(), key='users'), 200
 
 @app.route('/users/<username>', methods=['PUT'])
 @jwt_required()
@@ -94,7 +407,8 @@ def update_user(username):
     password = data.get('password')
 
     if password:
-        users[username]['password'] = generate_password_hash(password)
+        if not users.set_password(username, generate_password_hash(password)):
+            return jsonify({'message': 'User not found.'}), 404
         return jsonify({'message': 'User updated successfully.'}), 200
     else:
         return jsonify({'message': 'No data to update.'}), 400
@@ -102,10 +416,9 @@ def update_user(username):
 @app.route('/users/<username>', methods=['DELETE'])
 @jwt_required()
 def delete_user(username):
-    if username not in users:
+    if not users.delete(username):
         return jsonify({'message': 'User not found.'}), 404
 
-    del users[username]
     return jsonify({'message': 'User deleted successfully.'}), 200
 
 @app.errorhandler(404)
@@ -1,10 +1,19 @@
 from flask import Flask, jsonify, request
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+import flask_jwt_extended
 from werkzeug.security import generate_password_hash, check_password_hash
+from collections import OrderedDict
+import base64
+import hashlib
 import math
+import os
 import random
 import string
 import secrets
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from urllib.parse import urlencode
 
 app = Flask(__name__)
@@ -13,21 +22,202 @@ app = Flask(__name__)
 # WARNING: In production, use environment variables for secrets!
 # Example: app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY')
 app.config['JWT_SECRET_KEY'] = 'super_secret_jwt_key'  # Only for educational purposes
-jwt = JWTManager(app)
+
+# ==================== Verified Token Cache ====================
+#
+# A JWT never changes: once its signature and claims have been checked, the
+# same token string verifies the same way until it expires. Clients send the
+# same bearer token on every request, so the decoded claims are kept (keyed
+# by a SHA-256 digest of the token, never the token itself) until the token's
+# 'exp' and reused instead of parsing and verifying the token again.
+JWT_CACHE_SIZE = int(os.environ.get('JWT_CACHE_SIZE', 10_000))
+JWT_CACHE_MAX_TTL = float(os.environ.get('JWT_CACHE_MAX_TTL', 300))
+# The cache overrides JWTManager._decode_jwt_from_config, which is private:
+# only enable it on the flask-jwt-extended release pinned in requirements.txt
+JWT_CACHE_LIBRARY_VERSION = '4.6.'
+
+
+class CachingJWTManager(JWTManager):
+    """
+    JWTManager that remembers the claims of tokens it has already verified.
+
+    Entries expire at the token's 'exp' or after max_ttl, whichever comes
+    first, and the least recently used entry is evicted past max_size.
+    Decodes that allow expired tokens or check a CSRF value always take the
+    full path. max_size=0 disables the cache.
+    """
+
+    def __init__(self, app=None, max_size=JWT_CACHE_SIZE, max_ttl=JWT_CACHE_MAX_TTL, **kwargs):
+        if max_size and not flask_jwt_extended.__version__.startswith(JWT_CACHE_LIBRARY_VERSION):
+            raise RuntimeError(
+                f'CachingJWTManager was written against flask-jwt-extended {JWT_CACHE_LIBRARY_VERSION}x, '
+                f'found {flask_jwt_extended.__version__}: check _decode_jwt_from_config '
+                'or set JWT_CACHE_SIZE=0')
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self._verified = OrderedDict()
+        self._verified_lock = threading.Lock()
+        super().__init__(app, **kwargs)
+
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        if not self.max_size or csrf_value is not None or allow_expired:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        digest = hashlib.sha256(encoded_token.encode()).digest()
+        now = time.time()
+        with self._verified_lock:
+            entry = self._verified.get(digest)
+            if entry is not None:
+                claims, expires_at = entry
+                if now < expires_at:
+                    self._verified.move_to_end(digest)
+                    return dict(claims)
+                del self._verified[digest]
+
+        # Raises for bad signatures and expired tokens, which are never cached
+        claims = super()._decode_jwt_from_config(encoded_token)
+        expires_at = min(claims.get('exp', now + self.max_ttl), now + self.max_ttl)
+        with self._verified_lock:
+            self._verified[digest] = (claims, expires_at)
+            while len(self._verified) > self.max_size:
+                self._verified.popitem(last=False)
+        return dict(claims)
+
+    def clear_token_cache(self):
+        """Forget every verified token (e.g. after rotating the signing key)"""
+        with self._verified_lock:
+            self._verified.clear()
+
+
+jwt = CachingJWTManager(app)
 
 # Simulated database to store students
 students = {}
 
+# Ordered index of usernames (registration order) and each username's position
+# in it. Pages are sliced straight out of student_order, and a cursor can find
+# where it left off with one dict lookup, so any page costs O(per_page).
+student_order = []
+student_position = {}
+
+
+def add_student(username, record):
+    """Store a student and append it to the ordered index"""
+    students[username] = record
+    student_position[username] = len(student_order)
+    student_order.append(username)
+
+
+def encode_cursor(direction, username):
+    """Build an opaque cursor: 'n' = students after username, 'p' = before it"""
+    return base64.urlsafe_b64encode(f"{direction}:{username}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return (direction, position) for a cursor, or None if it is invalid"""
+    try:
+        direction, username = base64.urlsafe_b64decode(cursor.encode()).decode().split(':', 1)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if direction not in ('n', 'p') or username not in student_position:
+        return None
+    return direction, student_position[username]
+
+
+def paginate_by_cursor(cursor, per_page):
+    """
+    Keyset (cursor) pagination over student_order.
+
+    An empty cursor returns the first page. The response carries
+    next_cursor/prev_cursor (and matching links) to keep walking the list.
+    """
+    total_students = len(student_order)
+    if not cursor:
+        start = 0
+        end = min(per_page, total_students)
+    else:
+        decoded = decode_cursor(cursor)
+        if decoded is None:
+            return jsonify({'message': 'Invalid cursor.'}), 400
+        direction, position = decoded
+        if direction == 'n':
+            start = position + 1
+            end = min(start + per_page, total_students)
+        else:
+            end = position
+            start = max(end - per_page, 0)
+
+    students_list = student_order[start:end]
+
+    base_url = request.base_url
+    query_params = request.args.to_dict()
+    query_params.pop('page', None)
+
+    def build_url(new_cursor):
+        query_params['cursor'] = new_cursor
+        return f"{base_url}?{urlencode(query_params)}"
+
+    next_cursor = encode_cursor('n', students_list[-1]) if students_list and end < total_students else None
+    prev_cursor = encode_cursor('p', students_list[0]) if students_list and start > 0 else None
+
+    links = {}
+    if prev_cursor:
+        links['prev'] = build_url(prev_cursor)
+    if next_cursor:
+        links['next'] = build_url(next_cursor)
+
+    return jsonify({
+        'students': students_list,
+        'per_page': per_page,
+        'total_students': total_students,
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor,
+        'links': links
+    }), 200
+
+# Test-user seeding
+# Password hashing is deliberately slow, so bulk seeding hashes in a process
+# pool across all cores. SEED_FAST_HASH=1 switches to a single-iteration PBKDF2
+# hash for load-test fixtures; it is refused when APP_ENV=production.
+SEED_USERS = int(os.environ.get('SEED_USERS', 500))
+SEED_WORKERS = int(os.environ.get('SEED_WORKERS', os.cpu_count() or 1))
+SEED_FAST_HASH = os.environ.get('SEED_FAST_HASH') == '1'
+FAST_FIXTURE_HASH_METHOD = 'pbkdf2:sha256:1'
+
+
+def hash_passwords(passwords, workers=SEED_WORKERS, fast_hash=False):
+    """Hashes a batch of passwords, in a process pool when workers > 1"""
+    if fast_hash:
+        if os.environ.get('APP_ENV', 'development') == 'production':
+            raise RuntimeError('Fast fixture hashing cannot be used in production.')
+        hasher = partial(generate_password_hash, method=FAST_FIXTURE_HASH_METHOD)
+    else:
+        hasher = generate_password_hash
+
+    if workers <= 1 or len(passwords) < workers:
+        return [hasher(password) for password in passwords]
+
+    chunksize = max(1, len(passwords) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(hasher, passwords, chunksize=chunksize))
+
 # Generate test users
-def generate_users(students, total):
-    """Generates test users with random names"""
-    for _ in range(total):
+def generate_users(total, workers=SEED_WORKERS, fast_hash=False):
+    """Generates test users with random names and returns how many were added"""
+    usernames = {}
+    while len(usernames) < total:
         username = ''.join(random.choices(string.ascii_letters, k=8))
-        password = ''.join(random.choices(string.ascii_letters + string.digits, k=12))
-        students[username] = {
-            'password': generate_password_hash(password),
+        if username not in students:
+            usernames[username] = None
+    passwords = [''.join(random.choices(string.ascii_letters + string.digits, k=12))
+                 for _ in range(total)]
+
+    for username, password_hash in zip(usernames, hash_passwords(passwords, workers, fast_hash)):
+        add_student(username, {
+            'password': password_hash,
             'api_key': secrets.token_hex(16)
-        }
+        })
+    return total
 
 @app.route('/register', methods=['POST'])
 def register_student():
@@ -44,10 +234,10 @@ def register_student():
     if username in students:
         return jsonify({'message': 'User already exists.'}), 409
 
-    students[username] = {
+    add_student(username, {
         'password': generate_password_hash(password),
         'api_key': secrets.token_hex(16)
-    }
+    })
     return jsonify({'message': 'User registered successfully.', 'api_key': students[username]['api_key']}), 201
 
 @app.route('/login', methods=['POST'])
@@ -89,6 +279,9 @@ def get_students():
     - Calculate total_pages using math.ceil()
     - Get the subset of students using list slicing
     - Build navigation links using urlencode()
+
+    Passing 'cursor' instead of 'page' switches to keyset pagination
+    (already implemented in paginate_by_cursor).
     """
     try:
         # TODO: Get the query parameters 'page' and 'per_page' with default values
@@ -99,6 +292,10 @@ def get_students():
         if per_page <= 0 or per_page > 100:
             return jsonify({'message': 'per_page must be between 1 and 100.'}), 400
 
+        # Keyset pagination: O(per_page) however deep the page is
+        if 'cursor' in request.args:
+            return paginate_by_cursor(request.args['cursor'], per_page)
+
         # TODO: Calculate the total number of students and pages
         total_students = _____  # Hint: len(students)
         total_pages = _____  # Hint: math.ceil(total_students / per_page)
@@ -110,7 +307,7 @@ def get_students():
         # TODO: Determine the start and end indices of the student list
         start = _____  # Hint: (page - 1) * per_page
         end = _____  # Hint: start + per_page
-        students_list = _____  # Hint: list(students.keys())[start:end]
+        students_list = _____  # Hint: student_order[start:end]
 
         # TODO: Build links to navigate between pages
         base_url = request.base_url
@@ -159,5 +356,9 @@ def internal_error(error):
 
 if __name__ == '__main__':
     # Generate test users at startup
-    generate_users(students, 500)  # Generate 500 users to test pagination
+    # Generate test users to test pagination (500 by default, see SEED_USERS)
+    start = time.perf_counter()
+    seeded = generate_users(SEED_USERS, fast_hash=SEED_FAST_HASH)
+    elapsed = time.perf_counter() - start
+    print(f"Seeded {seeded} test users in {elapsed:.2f}s ({seeded / elapsed:.0f} users/s)")
     app.run(debug=True)
@@ -0,0 +1,61 @@
+"""
+Benchmark: fetching the last page of a 1M-student dataset
+
+Compares three ways of reaching the end of the list:
+- page mode, slicing list(students.keys()) (the original implementation)
+- page mode, slicing the student_order index
+- cursor mode, resuming from the next_cursor of the previous page
+
+Run:
+    python benchmark09.py
+"""
+import time
+
+from flask_jwt_extended import create_access_token
+
+from example09 import app, students, add_student, encode_cursor, student_order
+
+TOTAL_STUDENTS = 1_000_000
+PER_PAGE = 100
+REPEAT = 50
+
+
+def seed(total):
+    """Insert students directly (skips password hashing, it is not measured)"""
+    for i in range(total):
+        add_student(f'student{i:07d}', {'password': 'not-a-real-hash', 'api_key': ''})
+
+
+def timed(fn):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn()
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+if __name__ == '__main__':
+    seed(TOTAL_STUDENTS)
+    client = app.test_client()
+    with app.app_context():
+        headers = {'Authorization': f'Bearer {create_access_token(identity="bench")}'}
+
+    last_page = TOTAL_STUDENTS // PER_PAGE
+    cursor = encode_cursor('n', student_order[-PER_PAGE - 1])
+
+    def page_mode():
+        response = client.get(f'/students?page={last_page}&per_page={PER_PAGE}', headers=headers)
+        assert response.status_code == 200
+
+    def cursor_mode():
+        response = client.get(f'/students?cursor={cursor}&per_page={PER_PAGE}', headers=headers)
+        assert response.status_code == 200
+        assert response.get_json()['next_cursor'] is None
+
+    def keys_slice():
+        start = (last_page - 1) * PER_PAGE
+        return list(students.keys())[start:start + PER_PAGE]
+
+    print(f"{TOTAL_STUDENTS:,} students, per_page={PER_PAGE}, last page")
+    print(f"  list(students.keys()) slice only: {timed(keys_slice):8.3f} ms")
+    print(f"  GET /students?page=...          : {timed(page_mode):8.3f} ms")
+    print(f"  GET /students?cursor=...        : {timed(cursor_mode):8.3f} ms")
@@ -0,0 +1,68 @@
+"""
+Benchmark: /admin/dashboard and /student/data throughput by authorization path
+
+Three ways of turning a verified JWT into Flask-Principal needs:
+- users lookup: token without role claims and user_needs cleared before every
+  request, so the needs are rebuilt from the users database (the old behaviour)
+- cached need set: token without role claims, user_needs already warm
+- role claims: the token carries the roles (what /login issues), the needs
+  come from the compiled ROLE_NEEDS table
+Full requests are dominated by Flask and JWT overhead, so the authorization
+step alone (load_identity + Permission.can) is also timed per call.
+
+Run:
+    python benchmark10.py
+"""
+import time
+
+from flask_jwt_extended import create_access_token, decode_token
+
+from example10 import app, users, user_needs, load_identity, admin_permission, student_permission
+
+REQUESTS = 3_000
+AUTHORIZATIONS = 100_000
+SEED = 100_000
+
+
+def rate(client, path, headers, clear_cache):
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        if clear_cache:
+            user_needs.clear()
+        response = client.get(path, headers=headers)
+        assert response.status_code == 200
+    return REQUESTS / (time.perf_counter() - start)
+
+
+def authorization_us(permission, claims, clear_cache):
+    with app.test_request_context():
+        start = time.perf_counter()
+        for _ in range(AUTHORIZATIONS):
+            if clear_cache:
+                user_needs.clear()
+            load_identity({}, claims)
+            assert permission.can()
+        return (time.perf_counter() - start) / AUTHORIZATIONS * 1e6
+
+
+if __name__ == '__main__':
+    for i in range(SEED):
+        users[f'user{i}'] = {'password': 'not-a-real-hash', 'api_key': '', 'role': ('admin', 'student')[i % 2]}
+
+    client = app.test_client(use_cookies=False)
+    endpoints = {'/admin/dashboard': ('user0', admin_permission), '/student/data': ('user1', student_permission)}
+    variants = [('users lookup', False, True), ('cached need set', False, False), ('role claims', True, False)]
+
+    print(f"{SEED:,} users, {REQUESTS:,} requests per run")
+    print(f"{'endpoint':<17} | {'authorization path':<18} | {'req/s':>8} | {'authorization':>13}")
+    print('-' * 66)
+    for path, (username, permission) in endpoints.items():
+        for label, with_claims, clear_cache in variants:
+            claims = {'roles': [users[username]['role']]} if with_claims else None
+            with app.app_context():
+                token = create_access_token(identity=username, additional_claims=claims)
+                decoded = decode_token(token)
+            headers = {'Authorization': f'Bearer {token}'}
+            rate(client, path, headers, clear_cache)  # warm-up
+            print(f"{path:<17} | {label:<18} | {rate(client, path, headers, clear_cache):>8.0f} | "
+                  f"{authorization_us(permission, decoded, clear_cache):>10.2f} us")
@@ -3,9 +3,14 @@ from flask_jwt_extended import JWTManager, create_access_token, jwt_required, ge
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_principal import Principal, Permission, RoleNeed, identity_loaded, UserNeed, Identity, identity_changed
 import math
+import os
 import random
 import string
 import secrets
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
 from urllib.parse import urlencode
 
 app = Flask(__name__)
@@ -16,7 +21,8 @@ jwt = JWTManager(app)
 
 # Flask-Principal configuration for role and permission management
 app.config['SECRET_KEY'] = 'flask_secret_key'
-principals = Principal(app)
+# Identities are set from the JWT on every request (see load_identity), not stored in the session
+principals = Principal(app, use_sessions=False)
 
 # Role and permission definitions
 admin_permission = Permission(RoleNeed('admin'))  # Permission for administrators
@@ -25,19 +31,133 @@ student_permission = Permission(RoleNeed('student'))  # Permission for students
 # Simulated database for storing users
 users = {}
 
+# Secondary indexes: role -> usernames with that role, in registration order.
+# Dicts keep insertion order and add/remove keys in O(1), and the size of an
+# index is the number of users with that role.
+users_by_role = {}
+
+
+def index_user(username, role):
+    """Adds a user to the index of its role"""
+    users_by_role.setdefault(role, {})[username] = None
+
+
+def unindex_user(username, role):
+    """Removes a user from the index of its role"""
+    users_by_role.get(role, {}).pop(username, None)
+
+
+def move_user_role(username, old_role, new_role):
+    """Moves a user to the index of its new role (keeps its place if unchanged)"""
+    if old_role != new_role:
+        unindex_user(username, old_role)
+        index_user(username, new_role)
+
+
+def role_counts():
+    """Returns the number of users per role"""
+    return {role: len(usernames) for role, usernames in users_by_role.items()}
+
+# ==================== Compiled Permissions ====================
+#
+# Identities come from the JWT, not from the session: login puts the user's
+# roles in the token, and once @jwt_required() has verified it the role
+# claims are turned into needs through ROLE_NEEDS, a table compiled once at
+# startup, without reading the users database. Tokens without role claims,
+# or issued before the user's role last changed, fall back to a per-user need
+# set built from `users` and cached until update_user/delete_user drop it.
+ROLES = ('admin', 'student')
+
+
+def compile_role_needs(role):
+    """Returns the needs an identity with this role provides"""
+    return frozenset({RoleNeed(role)})
+
+
+ROLE_NEEDS = {role: compile_role_needs(role) for role in ROLES}
+user_needs = {}  # username -> frozenset of needs, built from the users database
+role_changes = {}  # username -> time of the user's last role change or deletion
+
+
+def role_needs(role):
+    """Looks up a role in ROLE_NEEDS, compiling roles outside ROLES on first use"""
+    needs = ROLE_NEEDS.get(role)
+    if needs is None:
+        needs = ROLE_NEEDS.setdefault(role, compile_role_needs(role))
+    return needs
+
+
+def user_needs_for(username):
+    """Returns the cached needs of a user, building them from the users database"""
+    needs = user_needs.get(username)
+    if needs is None:
+        role = users[username].get('role') if username in users else None
+        needs = frozenset({UserNeed(username)}) | (role_needs(role) if role else frozenset())
+        user_needs[username] = needs
+    return needs
+
+
+def forget_user_needs(username):
+    """Invalidates the cached needs and the role claims already issued to a user"""
+    user_needs.pop(username, None)
+    role_changes[username] = time.time()
+
+
+@jwt.user_lookup_loader
+def load_identity(jwt_header, jwt_data):
+    """Sets the request's Flask-Principal identity once its JWT is verified"""
+    identity = Identity(jwt_data['sub'], auth_type='jwt')
+    identity.claims = jwt_data
+    principals.set_identity(identity)
+    return identity
+
+# Test-user seeding
+# Password hashing is deliberately slow, so bulk seeding hashes in a process
+# pool across all cores. SEED_FAST_HASH=1 switches to a single-iteration PBKDF2
+# hash for load-test fixtures; it is refused when APP_ENV=production.
+SEED_USERS = int(os.environ.get('SEED_USERS', 100))
+SEED_WORKERS = int(os.environ.get('SEED_WORKERS', os.cpu_count() or 1))
+SEED_FAST_HASH = os.environ.get('SEED_FAST_HASH') == '1'
+FAST_FIXTURE_HASH_METHOD = 'pbkdf2:sha256:1'
+
+
+def hash_passwords(passwords, workers=SEED_WORKERS, fast_hash=False):
+    """Hashes a batch of passwords, in a process pool when workers > 1"""
+    if fast_hash:
+        if os.environ.get('APP_ENV', 'development') == 'production':
+            raise RuntimeError('Fast fixture hashing cannot be used in production.')
+        hasher = partial(generate_password_hash, method=FAST_FIXTURE_HASH_METHOD)
+    else:
+        hasher = generate_password_hash
+
+    if workers <= 1 or len(passwords) < workers:
+        return [hasher(password) for password in passwords]
+
+    chunksize = max(1, len(passwords) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(hasher, passwords, chunksize=chunksize))
+
 # Generate test users
-def generate_users(users, total):
-    """Generates test users with random roles"""
+def generate_users(users, total, workers=SEED_WORKERS, fast_hash=False):
+    """Generates test users with random roles and returns how many were added"""
     roles = ['admin', 'student']
-    for _ in range(total):
+    usernames = {}
+    while len(usernames) < total:
         username = ''.join(random.choices(string.ascii_letters, k=8))
-        password = ''.join(random.choices(string.ascii_letters + string.digits, k=12))
+        if username not in users:
+            usernames[username] = None
+    passwords = [''.join(random.choices(string.ascii_letters + string.digits, k=12))
+                 for _ in range(total)]
+
+    for username, password_hash in zip(usernames, hash_passwords(passwords, workers, fast_hash)):
         role = random.choice(roles)
         users[username] = {
-            'password': generate_password_hash(password),
+            'password': password_hash,
             'api_key': secrets.token_hex(16),
             'role': role
         }
+        index_user(username, role)
+    return total
 
 @app.route('/register', methods=['POST'])
 def register_user():
@@ -57,6 +177,7 @@ def register_user():
         'api_key': secrets.token_hex(16),
         'role': role
     }
+    index_user(username, role)
     return jsonify({'message': 'User registered successfully.', 'role': role}), 201
 
 @app.route('/login', methods=['POST'])
@@ -71,7 +192,7 @@ def login():
 
     user = users.get(username)
     if user and check_password_hash(user['password'], password):
-        access_token = create_access_token(identity=username)
+        access_token = create_access_token(identity=username, additional_claims={'roles': [user['role']]})
         identity_changed.send(app, identity=Identity(username))
         return jsonify({'access_token': access_token}), 200
 
@@ -88,21 +209,28 @@ def profile():
 def on_identity_loaded(sender, identity):
     """Loads permissions and roles for the authenticated user"""
     identity.user = identity.id
-    identity.provides.add(UserNeed(identity.id))
+    claims = getattr(identity, 'claims', None)
+    roles = claims.get('roles') if claims else None
 
-    if identity.id in users:
-        role = users[identity.id].get('role')
-        if role:
-            identity.provides.add(RoleNeed(role))
+    if roles is not None and claims['iat'] > role_changes.get(identity.id, 0):
+        # Role claims issued after the last role change: no database lookup
+        identity.provides.add(UserNeed(identity.id))
+        for role in roles:
+            identity.provides.update(role_needs(role))
+    else:
+        identity.provides.update(user_needs_for(identity.id))
 
 @app.route('/users', methods=['GET'])
 @jwt_required()
 def get_users():
-    """Returns a list of users with pagination"""
+    """Returns a list of users with pagination, optionally only those with ?role="""
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
+    role = request.args.get('role')
 
-    total_users = len(users)
+    # Filtered listings page through the role's index instead of every user
+    usernames = users if role is None else users_by_role.get(role, {})
+    total_users = len(usernames)
     total_pages = math.ceil(total_users / per_page)
 
     if page > total_pages or page < 1:
@@ -110,10 +238,13 @@ def get_users():
 
     start = (page - 1) * per_page
     end = start + per_page
-    users_list = list(users.keys())[start:end]
+    users_list = list(islice(usernames, start, end))
 
     return jsonify({
         'users': users_list,
+        'role': role,
+        'total_users': total_users,
+        'role_counts': role_counts(),
         'total_pages': total_pages,
         'current_page': page
     }), 200
@@ -137,7 +268,9 @@ def update_user(username):
     if password:
         users[username]['password'] = generate_password_hash(password)
     if role:
+        move_user_role(username, users[username]['role'], role)
         users[username]['role'] = role
+        forget_user_needs(username)
 
     return jsonify({'message': 'User updated successfully.'}), 200
 
@@ -149,7 +282,9 @@ def delete_user(username):
     if username not in users:
         return jsonify({'message': 'User not found.'}), 404
 
+    unindex_user(username, users[username]['role'])
     del users[username]
+    forget_user_needs(username)
     return jsonify({'message': 'User deleted successfully.'}), 200
 
 @app.route('/admin/dashboard', methods=['GET'])
@@ -167,5 +302,8 @@ def student_data():
     return jsonify({'message': f'Student data for {get_jwt_identity()}.'}), 200
 
 if __name__ == '__main__':
-    generate_users(users, 100)
+    start = time.perf_counter()
+    seeded = generate_users(users, SEED_USERS, fast_hash=SEED_FAST_HASH)
+    elapsed = time.perf_counter() - start
+    print(f"Seeded {seeded} test users in {elapsed:.2f}s ({seeded / elapsed:.0f} users/s)")
     app.run(debug=True)
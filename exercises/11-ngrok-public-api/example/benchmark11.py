@@ -0,0 +1,48 @@
+"""
+Benchmark: request-rate overhead of the structured access log
+
+Sends GET /health and POST /users requests through the Flask test client with
+the access log off, on, sampled at 10%, and on with request bodies. Log lines
+go to os.devnull, so the numbers show the cost on the request path.
+
+Run:
+    python benchmark11.py
+"""
+import os
+import time
+
+import example11
+from example11 import app, users
+
+REQUESTS = 5_000
+
+
+def run(label, enabled, sample_rate=1.0, bodies=False):
+    example11.ACCESS_LOG = enabled
+    example11.ACCESS_LOG_SAMPLE_RATE = sample_rate
+    example11.ACCESS_LOG_BODIES = bodies
+    users.clear()
+    client = app.test_client()
+
+    start = time.perf_counter()
+    for i in range(REQUESTS):
+        if i % 2:
+            client.get('/health')
+        else:
+            client.post('/users', json={'username': f'user{i}', 'email': f'user{i}@example.com'})
+    example11.access_log_listener.stop()  # waits until the queue is drained
+    elapsed = time.perf_counter() - start
+    example11.access_log_listener.start()
+
+    print(f"{label:<22} {REQUESTS / elapsed:>10.0f} req/s")
+    return REQUESTS / elapsed
+
+
+if __name__ == '__main__':
+    example11.access_log_handler.setStream(open(os.devnull, 'w'))
+    baseline = run('access log off', enabled=False)
+    for label, kwargs in [('access log on', {}),
+                          ('sampled 10%', {'sample_rate': 0.1}),
+                          ('on + request bodies', {'bodies': True})]:
+        rate = run(label, enabled=True, **kwargs)
+        print(f"{'':<22} overhead {100 * (baseline - rate) / baseline:5.1f}%")
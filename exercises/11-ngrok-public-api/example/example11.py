@@ -1,10 +1,177 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, g
+from collections import namedtuple
+from itertools import islice
+from logging.handlers import QueueHandler, QueueListener
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
 
 app = Flask(__name__)
 
+
+# ============================================================================
+# WEBHOOK EVENT STORE
+# ============================================================================
+
+# Compact record for a stored webhook event (a tuple, not a dict per event)
+WebhookEvent = namedtuple('WebhookEvent', [
+    'id', 'type', 'repository', 'pusher', 'ref', 'commits_count', 'commit_messages'
+])
+
+
+class EventStore:
+    """
+    Fixed-capacity ring buffer of webhook events.
+
+    Every event gets an increasing id. Once the buffer is full the oldest
+    events are overwritten, so memory stays bounded however busy the
+    repository is. If spill_path is set, every event is also appended to that
+    file as one JSON line, keeping a complete history on disk.
+    """
+
+    def __init__(self, capacity, spill_path=None):
+        self.capacity = capacity
+        self.spill_path = spill_path
+        # Line-buffered, so each event reaches the file as soon as it is stored
+        self._spill = open(spill_path, 'a', encoding='utf-8', buffering=1) if spill_path else None
+        self._buffer = [None] * capacity
+        self._next_id = 1
+        self._oldest_id = 1
+        self._lock = threading.Lock()
+
+    def append(self, **fields):
+        """Store a new event and return it"""
+        with self._lock:
+            event = WebhookEvent(id=self._next_id, **fields)
+            self._buffer[event.id % self.capacity] = event
+            self._next_id += 1
+            self._oldest_id = max(self._oldest_id, self._next_id - self.capacity)
+            if self._spill:
+                self._spill.write(json.dumps(event._asdict()) + '\n')
+        return event
+
+    def read(self, since=0, limit=100):
+        """Return up to `limit` events with an id greater than `since`, oldest first"""
+        with self._lock:
+            start = max(since + 1, self._oldest_id)
+            end = min(start + limit, self._next_id)
+            return [self._buffer[event_id % self.capacity] for event_id in range(start, end)]
+
+    def iter(self, since=0, limit=100, chunk_size=1000):
+        """
+        Like read(), but yields the events chunk_size at a time, taking the
+        lock once per chunk so writers are not held up by a long listing.
+        Events overwritten while the listing runs are skipped.
+        """
+        while limit > 0:
+            events = self.read(since, min(chunk_size, limit))
+            if not events:
+                return
+            yield from events
+            since = events[-1].id
+            limit -= len(events)
+
+    def clear(self):
+        """Drop all buffered events (ids keep increasing, so cursors stay valid)"""
+        with self._lock:
+            count = len(self)
+            self._buffer = [None] * self.capacity
+            self._oldest_id = self._next_id
+        return count
+
+    def __len__(self):
+        return self._next_id - self._oldest_id
+
+    @property
+    def last_id(self):
+        return self._next_id - 1
+
+
 # In-memory storage for demonstration
 users = {}
-webhook_events = []
+# Keeps the last WEBHOOK_EVENTS_CAPACITY events; set WEBHOOK_EVENTS_FILE to
+# also append every event to a JSON-lines file
+WEBHOOK_EVENTS_CAPACITY = int(os.environ.get('WEBHOOK_EVENTS_CAPACITY', 1000))
+webhook_events = EventStore(WEBHOOK_EVENTS_CAPACITY, os.environ.get('WEBHOOK_EVENTS_FILE'))
+
+
+# ============================================================================
+# STREAMING RESPONSES
+# ============================================================================
+
+# Large listings are streamed STREAM_CHUNK_SIZE items at a time, as a JSON array or NDJSON.
+STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', 1000))
+
+
+def to_json(obj):
+    return app.json.dumps(obj, separators=(',', ':'))
+
+
+def json_encoder():
+    # Same options as jsonify (sorted keys, ASCII, dates...), compact
+    return json.JSONEncoder(default=app.json.default, ensure_ascii=app.json.ensure_ascii,
+                            sort_keys=app.json.sort_keys, separators=(',', ':'))
+
+
+def wants_ndjson():
+    best = request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson'])
+    return best == 'application/x-ndjson'
+
+
+def iter_chunks(items, chunk_size=STREAM_CHUNK_SIZE):
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_json_array(items):
+    encode = json_encoder().encode
+    yield '['
+    separator = ''
+    for chunk in iter_chunks(items):
+        # One encode() per chunk keeps the per-item work in the C encoder
+        yield separator + encode(chunk)[1:-1]
+        separator = ','
+    yield ']'
+
+
+def iter_ndjson(items):
+    encode = json_encoder().encode
+    for chunk in iter_chunks(items):
+        yield '\n'.join(map(encode, chunk)) + '\n'
+
+
+def stream_items(items, key, after):
+    """
+    Response streaming {key: [items], **after()}, or, if the client asks, the
+    items as NDJSON followed by one last line holding after(). after() runs
+    once every item has been sent.
+    """
+    if wants_ndjson():
+        def lines():
+            yield from iter_ndjson(items)
+            trailer = after()
+            if trailer:
+                yield to_json(trailer) + '\n'
+
+        return Response(lines(), mimetype='application/x-ndjson')
+
+    def body():
+        yield '{' + to_json(key) + ':'
+        yield from iter_json_array(items)
+        trailer = after()
+        yield (',' + to_json(trailer)[1:-1] if trailer else '') + '}'
+
+    return Response(body(), mimetype='application/json')
 
 
 @app.route('/health', methods=['GET'])
@@ -86,6 +253,16 @@ def github_webhook():
 
     Official documentation: https://docs.github.com/en/webhooks/webhook-events-and-payloads
     """
+    # Ack-fast mode: validate and queue the payload, let the workers do the rest
+    # (pings are tiny, so they are still answered inline below)
+    if WEBHOOK_ASYNC and request.headers.get('X-GitHub-Event') != 'ping':
+        payload = request.get_json(silent=True)
+        if not isinstance(payload, dict) or not payload:
+            return jsonify({'error': 'Invalid payload'}), 400
+        if not webhook_queue.submit(payload):
+            return jsonify({'error': 'Webhook queue is full, event dropped'}), 503
+        return jsonify({'status': 'queued'}), 202
+
     data = request.get_json()
 
     if not data:
@@ -102,6 +279,20 @@ def github_webhook():
         print(f"{'='*60}\n")
         return jsonify({'status': 'pong'}), 200
 
+    commits_processed = process_push_event(data)
+
+    # GitHub expects 200 status to acknowledge receipt
+    # If you return non-2xx, GitHub will mark the webhook as failed
+    return jsonify({'status': 'received', 'commits_processed': commits_processed}), 200
+
+
+def process_push_event(data):
+    """
+    Logs a GitHub push payload and stores it in webhook_events.
+
+    Called inline by github_webhook, or by the background workers in
+    ack-fast mode. Returns the number of commits in the push.
+    """
     # Extract repository info from real GitHub payload
     repository = data.get('repository', {})
     repo_name = repository.get('full_name', 'unknown') if repository else 'unknown'
@@ -134,19 +325,115 @@ def github_webhook():
     print(f"{'='*60}\n")
 
     # Store the event for later viewing via /webhooks/events
-    webhook_event = {
-        'type': 'github_push',
-        'repository': repo_name,
-        'pusher': pusher_name,
-        'ref': ref,
-        'commits_count': len(commits),
-        'commit_messages': [c.get('message', '') for c in commits]
-    }
-    webhook_events.append(webhook_event)
+    webhook_events.append(
+        type='github_push',
+        repository=repo_name,
+        pusher=pusher_name,
+        ref=ref,
+        commits_count=len(commits),
+        commit_messages=tuple(c.get('message', '') for c in commits)
+    )
 
-    # GitHub expects 200 status to acknowledge receipt
-    # If you return non-2xx, GitHub will mark the webhook as failed
-    return jsonify({'status': 'received', 'commits_processed': len(commits)}), 200
+    return len(commits)
+
+
+# ============================================================================
+# ACK-FAST INGESTION (optional)
+# ============================================================================
+
+# With WEBHOOK_ASYNC=1 the endpoint only parses the body and checks that it is
+# a JSON object, queues it and answers 202 right away; background workers
+# process and store the event. GitHub times out slow receivers, and big pushes take a while to
+# process inline.
+WEBHOOK_ASYNC = os.environ.get('WEBHOOK_ASYNC') == '1'
+WEBHOOK_WORKERS = int(os.environ.get('WEBHOOK_WORKERS', 4))
+WEBHOOK_QUEUE_SIZE = int(os.environ.get('WEBHOOK_QUEUE_SIZE', 10_000))
+
+
+class WebhookQueue:
+    """
+    Bounded queue of webhook payloads drained by a pool of worker threads.
+
+    When the queue is full new deliveries are dropped (and counted) instead of
+    piling up in memory. metrics() reports depth, lag and counters.
+    """
+
+    def __init__(self, handler, workers, max_size):
+        self._handler = handler
+        self._workers = workers
+        self._queue = queue.Queue(maxsize=max_size)
+        self._threads = []
+        self._lock = threading.Lock()
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def start(self):
+        """Start the worker threads (only once)"""
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self._workers):
+                thread = threading.Thread(target=self._run, name=f'webhook-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, payload):
+        """Queue a parsed payload; returns False (and counts a drop) if the queue is full"""
+        try:
+            self._queue.put_nowait((time.monotonic(), payload))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def join(self):
+        """Block until every queued payload has been processed"""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            received_at, payload = self._queue.get()
+            lag = time.monotonic() - received_at
+            try:
+                self._handler(payload)
+                ok = True
+            except Exception as e:
+                app.logger.error(f'Webhook processing failed: {str(e)}')
+                ok = False
+            with self._lock:
+                if ok:
+                    self.processed += 1
+                else:
+                    self.failed += 1
+                self.last_lag = lag
+                self.max_lag = max(self.max_lag, lag)
+            self._queue.task_done()
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'queue_capacity': self._queue.maxsize,
+                'workers': len(self._threads),
+                'enqueued': self.enqueued,
+                'processed': self.processed,
+                'failed': self.failed,
+                'dropped': self.dropped,
+                'last_lag_ms': round(self.last_lag * 1000, 3),
+                'max_lag_ms': round(self.max_lag * 1000, 3)
+            }
+
+
+webhook_queue = WebhookQueue(process_push_event, WEBHOOK_WORKERS, WEBHOOK_QUEUE_SIZE)
+if WEBHOOK_ASYNC:
+    webhook_queue.start()
 
 
 # ============================================================================
@@ -156,13 +443,45 @@ def github_webhook():
 @app.route('/webhooks/events', methods=['GET'])
 def list_webhook_events():
     """
-    Returns all received webhook events.
+    Returns received webhook events, oldest first, one page at a time.
     Useful for debugging and verifying webhooks were received.
+
+    Query Parameters:
+        since (int): Only return events with an id greater than this (default: 0)
+        limit (int): Maximum number of events to return (default: 100,
+                     max: 1000 or WEBHOOK_EVENTS_CAPACITY if larger)
+
+    Pass the returned 'next_since' as 'since' to fetch the next page. With
+    Accept: application/x-ndjson, 'has_more', 'next_since' and 'total_events'
+    come in the last line, after the events.
+    The page is streamed, so even a page covering the whole buffer is never
+    held in memory as one JSON document.
     """
-    return jsonify({
-        'total_events': len(webhook_events),
-        'events': webhook_events
-    }), 200
+    since = request.args.get('since', 0, type=int)
+    limit = request.args.get('limit', 100, type=int)
+    max_limit = max(1000, webhook_events.capacity)
+
+    if since < 0 or limit < 1 or limit > max_limit:
+        return jsonify({'error': f'since must be >= 0 and limit between 1 and {max_limit}'}), 400
+
+    last_sent = None
+
+    def events():
+        nonlocal last_sent
+        for event in webhook_events.iter(since, limit):
+            last_sent = event.id
+            yield event._asdict()
+
+    def paging():
+        # Known only once the events have been sent
+        next_since = last_sent if last_sent is not None else max(since, webhook_events.last_id)
+        return {
+            'has_more': next_since < webhook_events.last_id,
+            'next_since': next_since,
+            'total_events': len(webhook_events)
+        }
+
+    return stream_items(events(), key='events', after=paging), 200
 
 
 @app.route('/webhooks/events/clear', methods=['POST'])
@@ -171,43 +490,101 @@ def clear_webhook_events():
     Clears all stored webhook events.
     Useful for testing - start fresh.
     """
-    global webhook_events
-    count = len(webhook_events)
-    webhook_events = []
+    count = webhook_events.clear()
     return jsonify({
         'message': f'Cleared {count} webhook events',
         'remaining': 0
     }), 200
 
 
+@app.route('/webhooks/metrics', methods=['GET'])
+def webhook_metrics():
+    """
+    Returns ingestion metrics: queue depth, processing lag and counters.
+    Only the ack-fast mode (WEBHOOK_ASYNC=1) uses the queue.
+    """
+    return jsonify({
+        'mode': 'async' if WEBHOOK_ASYNC else 'sync',
+        **webhook_queue.metrics()
+    }), 200
+
+
 # ============================================================================
 # REQUEST LOGGING (for debugging)
 # ============================================================================
 
+# Structured access log: one JSON line per request, written by a background
+# listener thread so request threads never block on stdout.
+#   ACCESS_LOG=0                 turn the access log off
+#   ACCESS_LOG_SAMPLE_RATE=0.1   log only ~10% of requests
+#   ACCESS_LOG_BODIES=1          include JSON bodies of POST/PUT/PATCH requests
+ACCESS_LOG = os.environ.get('ACCESS_LOG', '1') != '0'
+ACCESS_LOG_SAMPLE_RATE = float(os.environ.get('ACCESS_LOG_SAMPLE_RATE', 1.0))
+ACCESS_LOG_BODIES = os.environ.get('ACCESS_LOG_BODIES') == '1'
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formats a record whose message is a dict as a single JSON line"""
+
+    def format(self, record):
+        return json.dumps(record.msg, default=str)
+
+
+class AccessLogQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread"""
+
+    def prepare(self, record):
+        return record
+
+
+access_log_queue = queue.SimpleQueue()
+access_log_handler = logging.StreamHandler(sys.stdout)
+access_log_handler.setFormatter(JsonLinesFormatter())
+access_log_listener = QueueListener(access_log_queue, access_log_handler)
+access_log_listener.start()
+atexit.register(access_log_listener.stop)
+
+access_logger = logging.getLogger('access')
+access_logger.setLevel(logging.INFO)
+access_logger.propagate = False
+access_logger.addHandler(AccessLogQueueHandler(access_log_queue))
+
+
 @app.before_request
-def log_request():
+def start_request_timer():
+    """Remembers when the request started, for the access log"""
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def log_request(response):
     """
-    Logs all incoming requests.
+    Logs every request as one JSON line (method, path, status, duration...).
     This helps you see traffic coming through ngrok.
     """
     # Skip logging for some paths to reduce noise
-    if request.path in ['/favicon.ico']:
-        return
+    if not ACCESS_LOG or request.path in ['/favicon.ico']:
+        return response
+    if ACCESS_LOG_SAMPLE_RATE < 1.0 and random.random() >= ACCESS_LOG_SAMPLE_RATE:
+        return response
 
-    print(f"\n{'='*60}")
-    print(f"📨 Incoming Request:")
-    print(f"   Method: {request.method}")
-    print(f"   Path: {request.path}")
-    print(f"   From: {request.remote_addr}")
-    print(f"   User-Agent: {request.headers.get('User-Agent', 'Unknown')[:50]}")
-
-    # Show request body for POST/PUT requests
-    if request.method in ['POST', 'PUT', 'PATCH']:
-        body = request.get_json(silent=True)
-        if body:
-            print(f"   Body: {body}")
+    entry = {
+        'ts': time.time(),
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'duration_ms': round((time.perf_counter() - g.request_started) * 1000, 3),
+        'remote_addr': request.remote_addr,
+        'user_agent': request.headers.get('User-Agent', 'Unknown')[:50]
+    }
 
-    print(f"{'='*60}\n")
+    # Request bodies are opt-in. get_json() is cached by Flask, so a body the
+    # view already parsed is reused here instead of being parsed again.
+    if ACCESS_LOG_BODIES and request.method in ['POST', 'PUT', 'PATCH']:
+        entry['body'] = request.get_json(silent=True)
+
+    access_logger.info(entry)
+    return response
 
 
 # ============================================================================
@@ -260,8 +637,9 @@ if __name__ == '__main__':
     print("  GET  /users                 - List users")
     print("  POST /users                 - Create user")
     print("  POST /webhooks/github       - GitHub push webhook (MAIN ENDPOINT)")
-    print("  GET  /webhooks/events       - List all received webhooks")
+    print("  GET  /webhooks/events       - List received webhooks (?since=&limit=)")
     print("  POST /webhooks/events/clear - Clear webhook history")
+    print("  GET  /webhooks/metrics      - Ingestion queue metrics (WEBHOOK_ASYNC=1)")
     print("\nFor detailed instructions, see readme11.md")
     print("="*70 + "\n")
 
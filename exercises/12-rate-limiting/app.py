@@ -5,29 +5,462 @@ Learn to protect your API from abuse using Flask-Limiter
 
 from flask import Flask, jsonify, request
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+import flask_jwt_extended
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import timedelta
+from collections import OrderedDict
+from concurrent.futures import Future
+from limits.storage import Storage, MovingWindowSupport
+import atexit
+import hashlib
+import os
+import sqlite3
+import threading
+import time
 
 app = Flask(__name__)
 
 # JWT Configuration
 app.config['JWT_SECRET_KEY'] = 'your-secret-key-change-in-production'
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=1)
-jwt = JWTManager(app)
+
+# ==================== Verified Token Cache ====================
+#
+# A JWT never changes: once its signature and claims have been checked, the
+# same token string verifies the same way until it expires. Clients send the
+# same bearer token on every request, so the decoded claims are kept (keyed
+# by a SHA-256 digest of the token, never the token itself) until the token's
+# 'exp' and reused instead of parsing and verifying the token again.
+JWT_CACHE_SIZE = int(os.environ.get('JWT_CACHE_SIZE', 10_000))
+JWT_CACHE_MAX_TTL = float(os.environ.get('JWT_CACHE_MAX_TTL', 300))
+# The cache overrides JWTManager._decode_jwt_from_config, which is private:
+# only enable it on the flask-jwt-extended release pinned in requirements.txt
+JWT_CACHE_LIBRARY_VERSION = '4.6.'
+
+
+class CachingJWTManager(JWTManager):
+    """
+    JWTManager that remembers the claims of tokens it has already verified.
+
+    Entries expire at the token's 'exp' or after max_ttl, whichever comes
+    first, and the least recently used entry is evicted past max_size.
+    Decodes that allow expired tokens or check a CSRF value always take the
+    full path. max_size=0 disables the cache.
+    """
+
+    def __init__(self, app=None, max_size=JWT_CACHE_SIZE, max_ttl=JWT_CACHE_MAX_TTL, **kwargs):
+        if max_size and not flask_jwt_extended.__version__.startswith(JWT_CACHE_LIBRARY_VERSION):
+            raise RuntimeError(
+                f'CachingJWTManager was written against flask-jwt-extended {JWT_CACHE_LIBRARY_VERSION}x, '
+                f'found {flask_jwt_extended.__version__}: check _decode_jwt_from_config '
+                'or set JWT_CACHE_SIZE=0')
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self._verified = OrderedDict()
+        self._verified_lock = threading.Lock()
+        super().__init__(app, **kwargs)
+
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        if not self.max_size or csrf_value is not None or allow_expired:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        digest = hashlib.sha256(encoded_token.encode()).digest()
+        now = time.time()
+        with self._verified_lock:
+            entry = self._verified.get(digest)
+            if entry is not None:
+                claims, expires_at = entry
+                if now < expires_at:
+                    self._verified.move_to_end(digest)
+                    return dict(claims)
+                del self._verified[digest]
+
+        # Raises for bad signatures and expired tokens, which are never cached
+        claims = super()._decode_jwt_from_config(encoded_token)
+        expires_at = min(claims.get('exp', now + self.max_ttl), now + self.max_ttl)
+        with self._verified_lock:
+            self._verified[digest] = (claims, expires_at)
+            while len(self._verified) > self.max_size:
+                self._verified.popitem(last=False)
+        return dict(claims)
+
+    def clear_token_cache(self):
+        """Forget every verified token (e.g. after rotating the signing key)"""
+        with self._verified_lock:
+            self._verified.clear()
+
+
+jwt = CachingJWTManager(app)
+
+# ==================== Rate Limit Storage ====================
+#
+# The default "memory://" storage lives inside one process, so with several
+# gunicorn workers every worker enforces its own copy of each limit. Point
+# RATELIMIT_STORAGE_URI at a store all workers share:
+#   redis://localhost:6379           - Redis (needs `pip install redis`), multi-host
+#   sqlite:///ratelimits.db          - SQLiteStorage below, single-host multi-process
+# The moving-window strategy keeps a timestamp per hit, so limits are exact
+# (a true sliding window) rather than resetting at fixed boundaries.
+RATELIMIT_STORAGE_URI = os.environ.get('RATELIMIT_STORAGE_URI', 'memory://')
+RATELIMIT_STRATEGY = os.environ.get('RATELIMIT_STRATEGY', 'moving-window')
+
+
+class SQLiteStorage(Storage, MovingWindowSupport):
+    """
+    Rate limit storage in a local SQLite file, shared by every process on the host.
+
+    Registered for the "sqlite" scheme: sqlite:///relative.db or
+    sqlite:////absolute/path.db. Every check-and-update runs in one
+    BEGIN IMMEDIATE transaction (or one UPSERT statement), so concurrent
+    workers can never both take the last slot of a limit.
+    """
+
+    STORAGE_SCHEME = ['sqlite']
+
+    def __init__(self, uri, wrap_exceptions=False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.path = uri.split('://', 1)[1][1:]
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS counters '
+                     '(key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires_at REAL NOT NULL)')
+        conn.execute('CREATE TABLE IF NOT EXISTS window_entries (key TEXT NOT NULL, atime REAL NOT NULL)')
+        conn.execute('CREATE INDEX IF NOT EXISTS window_entries_key_atime ON window_entries (key, atime)')
+
+    def _connection(self):
+        # One connection per thread; autocommit mode, transactions are explicit
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def incr(self, key, expiry, amount=1):
+        now = time.time()
+        row = self._connection().execute(
+            'INSERT INTO counters (key, value, expires_at) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET '
+            '  value = CASE WHEN expires_at <= ? THEN excluded.value ELSE value + excluded.value END, '
+            '  expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at ELSE expires_at END '
+            'RETURNING value',
+            (key, amount, now + expiry, now, now)).fetchone()
+        return row[0]
+
+    def get(self, key):
+        row = self._connection().execute(
+            'SELECT value FROM counters WHERE key = ? AND expires_at > ?', (key, time.time())).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key):
+        row = self._connection().execute(
+            'SELECT expires_at FROM counters WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else time.time()
+
+    def check(self):
+        try:
+            self._connection().execute('SELECT 1')
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            count = conn.execute('DELETE FROM counters').rowcount
+            count += conn.execute('DELETE FROM window_entries').rowcount
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return count
+
+    def clear(self, key):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM counters WHERE key = ?', (key,))
+            conn.execute('DELETE FROM window_entries WHERE key = ?', (key,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def acquire_entry(self, key, limit, expiry, amount=1):
+        if amount > limit:
+            return False
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            now = time.time()
+            conn.execute('DELETE FROM window_entries WHERE key = ? AND atime <= ?', (key, now - expiry))
+            (count,) = conn.execute('SELECT COUNT(*) FROM window_entries WHERE key = ?', (key,)).fetchone()
+            acquired = count + amount <= limit
+            if acquired:
+                conn.executemany('INSERT INTO window_entries (key, atime) VALUES (?, ?)', [(key, now)] * amount)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return acquired
+
+    def get_moving_window(self, key, limit, expiry):
+        now = time.time()
+        oldest, count = self._connection().execute(
+            'SELECT MIN(atime), COUNT(*) FROM window_entries WHERE key = ? AND atime > ?',
+            (key, now - expiry)).fetchone()
+        return (oldest, count) if count else (now, 0)
+
 
 # TODO: Initialize Flask-Limiter
 # Hint: limiter = Limiter(app=app, key_func=get_remote_address, default_limits=["200 per day", "50 per hour"])
 limiter = Limiter(
     app=app,
     key_func=_____,  # TODO: What function determines who is making the request?
-    default_limits=_____  # TODO: Set default limits (e.g., ["200 per day", "50 per hour"])
+    default_limits=_____,  # TODO: Set default limits (e.g., ["200 per day", "50 per hour"])
+    storage_uri=RATELIMIT_STORAGE_URI,  # memory:// by default; shared storage for multiple workers
+    strategy=RATELIMIT_STRATEGY
 )
 
+# ==================== Usage Metering ====================
+#
+# Per-user API call counters. Increments go to one of USAGE_SHARDS shards, each
+# with its own lock, so concurrent requests never lose an update and never
+# wait on a single global lock. If USAGE_DB_PATH is set, a background thread
+# flushes the accumulated deltas to SQLite every USAGE_FLUSH_INTERVAL seconds
+# in one batched transaction, so counts survive restarts and are shared by
+# every worker process.
+USAGE_SHARDS = 16
+USAGE_DB_PATH = os.environ.get('USAGE_DB_PATH')
+USAGE_FLUSH_INTERVAL = float(os.environ.get('USAGE_FLUSH_INTERVAL', 5))
+
+
+class UsageShard:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {}     # user -> total (in-memory mode only)
+        self.pending = {}    # user -> increments not yet flushed to disk
+        self.in_flight = {}  # user -> increments being flushed, until the commit is done
+        self.stored = {}     # user -> calls on disk when this process last read or flushed them
+
+
+class UsageMeter:
+    """Sharded per-user counters with optional batched persistence to SQLite"""
+
+    def __init__(self, shards=USAGE_SHARDS, db_path=None, flush_interval=USAGE_FLUSH_INTERVAL):
+        self._shards = [UsageShard() for _ in range(shards)]
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._flush_lock = threading.Lock()
+        # Odd while a flush is committing; total() retries if it changes under it
+        self._generation = 0
+        if db_path:
+            conn = self._connection()
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS api_usage (user TEXT PRIMARY KEY, calls INTEGER NOT NULL)')
+            threading.Thread(target=self._flush_loop, name='usage-flush', daemon=True).start()
+            atexit.register(self.flush)
+
+    def _shard(self, user):
+        return self._shards[hash(user) % len(self._shards)]
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def _stored(self, user):
+        if not self.db_path:
+            return 0
+        row = self._connection().execute('SELECT calls FROM api_usage WHERE user = ?', (user,)).fetchone()
+        return row[0] if row else 0
+
+    def increment(self, user, amount=1):
+        """
+        Count `amount` calls for user and return the user's count as this
+        process knows it. Only the user's shard is locked and the disk is never
+        read; with SQLite, calls from other workers show up once this process
+        flushes or calls total().
+        """
+        shard = self._shard(user)
+        with shard.lock:
+            if not self.db_path:
+                shard.counts[user] = shard.counts.get(user, 0) + amount
+                return shard.counts[user]
+            shard.pending[user] = shard.pending.get(user, 0) + amount
+            return shard.stored.get(user, 0) + shard.in_flight.get(user, 0) + shard.pending[user]
+
+    def total(self, user):
+        """
+        Aggregate read: calls stored on disk (flushed by every worker) plus
+        this process's increments that are not flushed yet.
+        """
+        shard = self._shard(user)
+        if not self.db_path:
+            with shard.lock:
+                return shard.counts.get(user, 0)
+        while True:
+            generation = self._generation
+            if generation % 2:
+                # A flush is committing: wait for it
+                with self._flush_lock:
+                    continue
+            with shard.lock:
+                unflushed = shard.pending.get(user, 0) + shard.in_flight.get(user, 0)
+            stored = self._stored(user)
+            # No commit started or finished meanwhile, so stored and unflushed
+            # don't overlap and nothing was missed
+            with shard.lock:
+                if self._generation == generation:
+                    shard.stored[user] = stored
+                    return stored + unflushed
+
+    def flush(self):
+        """Write all pending increments to disk in one transaction"""
+        if not self.db_path:
+            return
+        with self._flush_lock:
+            # Moving pending to in_flight keeps their sum, so total() is unaffected
+            batch = {}
+            for shard in self._shards:
+                with shard.lock:
+                    shard.in_flight, shard.pending = shard.pending, {}
+                    batch.update(shard.in_flight)
+            if not batch:
+                return
+
+            conn = self._connection()
+            committed = False
+            self._generation += 1
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.executemany(
+                    'INSERT INTO api_usage (user, calls) VALUES (?, ?) '
+                    'ON CONFLICT (user) DO UPDATE SET calls = calls + excluded.calls',
+                    batch.items())
+                # Read back inside the transaction: includes other workers' flushes
+                stored = {user: self._stored(user) for user in batch}
+                conn.execute('COMMIT')
+                committed = True
+            finally:
+                if not committed and conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                for shard in self._shards:
+                    with shard.lock:
+                        if committed:
+                            for user in shard.in_flight:
+                                shard.stored[user] = stored[user]
+                        else:
+                            # Put the deltas back so they are retried on the next flush
+                            for user, amount in shard.in_flight.items():
+                                shard.pending[user] = shard.pending.get(user, 0) + amount
+                        shard.in_flight = {}
+                self._generation += 1
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                app.logger.error(f'Usage flush failed: {str(e)}')
+
+
 # In-memory data storage
 users = {}
-api_calls = {}  # Track API usage per user
+api_calls = UsageMeter(db_path=USAGE_DB_PATH)  # Track API usage per user
+
+
+# ==================== Search Result Cache ====================
+#
+# /api/search is expensive, and the same queries come in from many users.
+# Results are cached per normalized query (LRU + TTL), and concurrent identical
+# queries are coalesced so only one of them runs the search. With
+# SEARCH_CACHE_HITS_FREE=1 (the default), requests answered from the cache do
+# not count against the strict search limit.
+SEARCH_CACHE_TTL = 300  # seconds
+SEARCH_CACHE_MAX_SIZE = 1024  # entries
+SEARCH_CACHE_HITS_FREE = os.environ.get('SEARCH_CACHE_HITS_FREE', '1') == '1'
+
+
+class SearchCache:
+    """LRU + TTL cache that coalesces concurrent misses for the same key"""
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._inflight = {}  # key -> Future
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[1] > time.monotonic()
+
+    def get_or_compute(self, key, compute):
+        """Return (value, hit): hit is False only for the request that computed it"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                return entry[0], True
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            value = compute()
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            with self._lock:
+                self._entries[key] = (value, time.monotonic() + self.ttl)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+            future.set_result(value)
+            return value, False
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+
+search_cache = SearchCache(SEARCH_CACHE_TTL, SEARCH_CACHE_MAX_SIZE)
+
+
+def normalize_query(query):
+    """Case- and whitespace-insensitive form of a search query"""
+    return ' '.join(query.lower().split())
+
+
+def search_cache_hit():
+    """exempt_when callback: cached searches skip the strict search limit"""
+    return SEARCH_CACHE_HITS_FREE and normalize_query(request.args.get('q', '')) in search_cache
+
+
+def run_search(query):
+    """Simulate expensive search operation"""
+    return [
+        {'id': i, 'title': f'Result {i} for "{query}"'}
+        for i in range(1, 6)
+    ]
 
 
 # ==================== Helper Functions ====================
@@ -125,15 +558,13 @@ def get_data():
     """
     current_user = get_jwt_identity()
 
-    # Track API usage
-    if current_user not in api_calls:
-        api_calls[current_user] = 0
-    api_calls[current_user] += 1
+    # Track API usage (no lost updates under concurrency, see UsageMeter)
+    total_api_calls = api_calls.increment(current_user)
 
     return jsonify({
         'message': 'Here is your data',
         'user': current_user,
-        'total_api_calls': api_calls[current_user],
+        'total_api_calls': total_api_calls,
         'data': [
             {'id': 1, 'name': 'Item 1'},
             {'id': 2, 'name': 'Item 2'},
@@ -145,13 +576,16 @@ def get_data():
 @app.route('/api/search', methods=['GET'])
 @jwt_required()
 # TODO: Add strict rate limit for expensive operations
-# Hint: @limiter.limit("5 per minute")
-@limiter.limit(_____)
+# Hint: @limiter.limit("5 per minute", exempt_when=search_cache_hit)
+@limiter.limit(_____, exempt_when=search_cache_hit)
 def search():
     """
     Expensive search endpoint
     Strictly rate limited to 5 requests per minute
     This simulates a resource-intensive operation (database query, external API call, etc.)
+
+    Results are cached per normalized query; the X-Cache header says whether
+    this response was served from the cache (HIT) or computed (MISS).
     """
     query = request.args.get('q', '')
     current_user = get_jwt_identity()
@@ -159,18 +593,17 @@ def search():
     if not query:
         return jsonify({'error': 'Missing search query parameter'}), 400
 
-    # Simulate expensive search operation
-    results = [
-        {'id': i, 'title': f'Result {i} for "{query}"'}
-        for i in range(1, 6)
-    ]
+    normalized = normalize_query(query)
+    results, hit = search_cache.get_or_compute(normalized, lambda: run_search(normalized))
 
-    return jsonify({
+    response = jsonify({
         'query': query,
         'results': results,
         'user': current_user,
         'note': 'This endpoint is rate limited to 5 requests per minute'
-    }), 200
+    })
+    response.headers['X-Cache'] = 'HIT' if hit else 'MISS'
+    return response, 200
 
 
 @app.route('/api/unlimited', methods=['GET'])
@@ -199,7 +632,7 @@ def get_stats():
 
     return jsonify({
         'user': current_user,
-        'total_api_calls': api_calls.get(current_user, 0),
+        'total_api_calls': api_calls.total(current_user),
         'registered_users': len(users)
     }), 200
 
@@ -232,6 +665,7 @@ if __name__ == '__main__':
     print("  GET    /api/stats         - Get stats (10 per minute)")
     print("  GET    /health            - Health check (no limit)")
     print("\nDefault limits: 200 per day, 50 per hour")
+    print(f"Rate limit storage: {RATELIMIT_STORAGE_URI} ({RATELIMIT_STRATEGY})")
     print("Rate limit info included in response headers")
     print("="*60 + "\n")
 
@@ -0,0 +1,78 @@
+"""
+Benchmark: rate limits enforced across several worker processes
+
+Each worker process imports example12.py (like a gunicorn worker would) and
+hammers a route limited to LIMIT requests per minute. With memory:// storage
+every process enforces its own limit; with the shared SQLite storage the
+total number of accepted requests must be exactly LIMIT.
+
+Also reports the per-request cost of each storage in a single process.
+
+Run:
+    python benchmark12.py
+"""
+import multiprocessing
+import os
+import tempfile
+import time
+
+LIMIT = 100
+WORKERS = 4
+REQUESTS_PER_WORKER = 100
+COST_REQUESTS = 2_000
+
+
+def load_app(storage_uri, limit=LIMIT):
+    """Import example12 with the given storage and add a benchmark route"""
+    os.environ['RATELIMIT_STORAGE_URI'] = storage_uri
+    import example12
+
+    @example12.app.route('/bench', methods=['GET'])
+    @example12.limiter.limit(f'{limit} per minute')
+    def bench():
+        return 'ok', 200
+
+    return example12.app
+
+
+def worker(storage_uri, requests, results):
+    client = load_app(storage_uri).test_client()
+    accepted = sum(client.get('/bench').status_code == 200 for _ in range(requests))
+    results.put(accepted)
+
+
+def cost_worker(storage_uri, results):
+    client = load_app(storage_uri, limit=1_000_000).test_client()
+    start = time.perf_counter()
+    for _ in range(COST_REQUESTS):
+        client.get('/bench')
+    results.put((time.perf_counter() - start) / COST_REQUESTS)
+
+
+def in_processes(target, storage_uri, count, *args):
+    """Run target(storage_uri, *args, results) in `count` processes, return the results"""
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=target, args=(storage_uri, *args, results))
+                 for _ in range(count)]
+    for process in processes:
+        process.start()
+    values = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return values
+
+
+if __name__ == '__main__':
+    multiprocessing.set_start_method('spawn')
+    sqlite_uri = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'ratelimits.db')
+
+    print(f"limit {LIMIT}/minute, {WORKERS} processes x {REQUESTS_PER_WORKER} requests")
+    for uri in ['memory://', sqlite_uri]:
+        accepted = sum(in_processes(worker, uri, WORKERS, REQUESTS_PER_WORKER))
+        verdict = 'exact' if accepted == LIMIT else f'{accepted / LIMIT:.0f}x the limit'
+        print(f"  {uri.split('://')[0]:<7} accepted {accepted:>4} ({verdict})")
+
+    print("per-request cost (single process):")
+    for uri in ['memory://', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'cost.db')]:
+        (cost,) = in_processes(cost_worker, uri, 1)
+        print(f"  {uri.split('://')[0]:<7} {cost * 1e6:8.1f} us")
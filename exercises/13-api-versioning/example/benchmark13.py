@@ -0,0 +1,56 @@
+"""
+Benchmark: listing one user's notes with 10,000 users x 100 notes each
+
+Compares the old full scan over every note with the per-owner index used by
+GET /api/v1/notes and GET /api/v2/notes.
+
+Run:
+    python benchmark13.py
+"""
+import time
+
+from flask_jwt_extended import create_access_token
+
+from example13 import app, notes, save_note
+
+USERS = 10_000
+NOTES_PER_USER = 100
+REPEAT = 20
+
+
+def seed():
+    """Insert notes directly, interleaving owners like real traffic would"""
+    note_id = 1
+    for _ in range(NOTES_PER_USER):
+        for u in range(USERS):
+            save_note({'id': note_id, 'title': f'Note {note_id}', 'content': '', 'tags': [],
+                       'owner': f'user{u}', 'created_at': '', 'updated_at': ''})
+            note_id += 1
+
+
+def timed(fn):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn()
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+if __name__ == '__main__':
+    seed()
+    client = app.test_client()
+    with app.app_context():
+        headers = {'Authorization': f'Bearer {create_access_token(identity="user42")}'}
+
+    def full_scan():
+        return [note for note in notes.values() if note['owner'] == 'user42'][40:50]
+
+    def v1():
+        assert len(client.get('/api/v1/notes', headers=headers).get_json()) == NOTES_PER_USER
+
+    def v2():
+        assert client.get('/api/v2/notes?page=5', headers=headers).get_json()['count'] == NOTES_PER_USER
+
+    print(f"{USERS:,} users x {NOTES_PER_USER} notes = {len(notes):,} notes")
+    print(f"  old full scan (filter only)  : {timed(full_scan):8.3f} ms")
+    print(f"  GET /api/v1/notes (indexed)  : {timed(v1):8.3f} ms")
+    print(f"  GET /api/v2/notes?page=5     : {timed(v2):8.3f} ms")
@@ -5,20 +5,275 @@ Learn to manage API versions and breaking changes
 
 from flask import Flask, jsonify, request, make_response
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+import flask_jwt_extended
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import timedelta, datetime
+from collections import OrderedDict
+from collections.abc import MutableMapping
+import hashlib
+import json
+import os
+import secrets
+import threading
+import time
 
 app = Flask(__name__)
 
 # JWT Configuration
 app.config['JWT_SECRET_KEY'] = 'your-secret-key-change-in-production'
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=1)
-jwt = JWTManager(app)
 
-# In-memory data storage
+# ==================== Verified Token Cache ====================
+#
+# A JWT never changes: once its signature and claims have been checked, the
+# same token string verifies the same way until it expires. Clients send the
+# same bearer token on every request, so the decoded claims are kept (keyed
+# by a SHA-256 digest of the token, never the token itself) until the token's
+# 'exp' and reused instead of parsing and verifying the token again.
+JWT_CACHE_SIZE = int(os.environ.get('JWT_CACHE_SIZE', 10_000))
+JWT_CACHE_MAX_TTL = float(os.environ.get('JWT_CACHE_MAX_TTL', 300))
+# The cache overrides JWTManager._decode_jwt_from_config, which is private:
+# only enable it on the flask-jwt-extended release pinned in requirements.txt
+JWT_CACHE_LIBRARY_VERSION = '4.6.'
+
+
+class CachingJWTManager(JWTManager):
+    """
+    JWTManager that remembers the claims of tokens it has already verified.
+
+    Entries expire at the token's 'exp' or after max_ttl, whichever comes
+    first, and the least recently used entry is evicted past max_size.
+    Decodes that allow expired tokens or check a CSRF value always take the
+    full path. max_size=0 disables the cache.
+    """
+
+    def __init__(self, app=None, max_size=JWT_CACHE_SIZE, max_ttl=JWT_CACHE_MAX_TTL, **kwargs):
+        if max_size and not flask_jwt_extended.__version__.startswith(JWT_CACHE_LIBRARY_VERSION):
+            raise RuntimeError(
+                f'CachingJWTManager was written against flask-jwt-extended {JWT_CACHE_LIBRARY_VERSION}x, '
+                f'found {flask_jwt_extended.__version__}: check _decode_jwt_from_config '
+                'or set JWT_CACHE_SIZE=0')
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self._verified = OrderedDict()
+        self._verified_lock = threading.Lock()
+        super().__init__(app, **kwargs)
+
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        if not self.max_size or csrf_value is not None or allow_expired:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        digest = hashlib.sha256(encoded_token.encode()).digest()
+        now = time.time()
+        with self._verified_lock:
+            entry = self._verified.get(digest)
+            if entry is not None:
+                claims, expires_at = entry
+                if now < expires_at:
+                    self._verified.move_to_end(digest)
+                    return dict(claims)
+                del self._verified[digest]
+
+        # Raises for bad signatures and expired tokens, which are never cached
+        claims = super()._decode_jwt_from_config(encoded_token)
+        expires_at = min(claims.get('exp', now + self.max_ttl), now + self.max_ttl)
+        with self._verified_lock:
+            self._verified[digest] = (claims, expires_at)
+            while len(self._verified) > self.max_size:
+                self._verified.popitem(last=False)
+        return dict(claims)
+
+    def clear_token_cache(self):
+        """Forget every verified token (e.g. after rotating the signing key)"""
+        with self._verified_lock:
+            self._verified.clear()
+
+
+jwt = CachingJWTManager(app)
+
+# ==================== Durable Storage ====================
+#
+# DurableDict keeps its data in memory (reads never touch the disk) and logs
+# every write to an append-only write-ahead log, <path>.wal. A write returns
+# once its log record is on disk; with group commit, writers that arrive
+# while an fsync is running share the next one instead of queueing one each.
+# Every snapshot_every writes the whole table is saved to <path>.snapshot and
+# the log starts over, so startup = load the snapshot + replay a short log.
+# Values must be JSON-serialisable; a value changed in place must be assigned
+# again to be logged.
+#   fsync='group'   fsync every write, batching concurrent writers (default)
+#   fsync='always'  one fsync per write, no batching
+#   fsync='off'     leave flushing to the OS (survives a process crash, not a power loss)
+SNAPSHOT_EVERY = int(os.environ.get('SNAPSHOT_EVERY', 10_000))
+
+
+class DurableDict(MutableMapping):
+    """Dict-like table with a write-ahead log and snapshots (in memory only if path is None)"""
+
+    def __init__(self, path=None, fsync='group', snapshot_every=SNAPSHOT_EVERY):
+        self.path = path
+        self.fsync = fsync
+        self.snapshot_every = snapshot_every
+        self._data = {}
+        self._lock = threading.Lock()       # orders log records and memory updates
+        self._sync_lock = threading.Lock()  # one fsync at a time
+        self._written = 0                   # records written to the log
+        self._synced = 0                    # records known to be on disk
+        self._wal_records = 0
+        self._wal = None
+        if path is not None:
+            self._recover()
+            self._wal = open(f'{path}.wal', 'a', encoding='utf-8')
+
+    # Reads: plain dict operations
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def values(self):
+        return self._data.values()
+
+    def items(self):
+        return self._data.items()
+
+    # Writes: logged, then applied
+    def __setitem__(self, key, value):
+        self._commit(['set', key, value])
+
+    def __delitem__(self, key):
+        if key not in self._data:
+            raise KeyError(key)
+        self._commit(['del', key])
+
+    def _apply(self, record):
+        if record[0] == 'set':
+            self._data[record[1]] = record[2]
+        else:
+            self._data.pop(record[1], None)
+
+    def _commit(self, record):
+        if self._wal is None:
+            self._apply(record)
+            return
+
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        with self._lock:
+            self._wal.write(line)
+            self._wal.flush()
+            self._apply(record)
+            self._written += 1
+            self._wal_records += 1
+            sequence = self._written
+            if self._wal_records >= self.snapshot_every:
+                self._snapshot()
+        self._sync(sequence)
+
+    def _sync(self, sequence):
+        if self.fsync == 'off':
+            return
+        with self._sync_lock:
+            if self.fsync == 'group' and self._synced >= sequence:
+                return  # another writer's fsync already covered this record
+            target = self._written
+            os.fsync(self._wal.fileno())
+            self._synced = target
+
+    def _snapshot(self):
+        # Called with self._lock held: no write can slip in between
+        tmp_path = f'{self.path}.snapshot.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for key, value in self._data.items():
+                f.write(json.dumps([key, value], separators=(',', ':')) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, f'{self.path}.snapshot')
+        if hasattr(os, 'O_DIRECTORY'):
+            dir_fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+        # Everything logged so far is in the snapshot: start a new log
+        with self._sync_lock:
+            self._wal.close()
+            self._wal = open(f'{self.path}.wal', 'w', encoding='utf-8')
+            self._synced = self._written
+        self._wal_records = 0
+
+    def _recover(self):
+        snapshot_path = f'{self.path}.snapshot'
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, encoding='utf-8') as f:
+                for line in f:
+                    key, value = json.loads(line)
+                    self._data[key] = value
+
+        wal_path = f'{self.path}.wal'
+        if not os.path.exists(wal_path):
+            return
+        valid_bytes = 0
+        with open(wal_path, 'rb') as f:
+            for line in f:
+                # A crash can leave a half-written last record: drop it
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                self._apply(record)
+                self._wal_records += 1
+                valid_bytes += len(line)
+        os.truncate(wal_path, valid_bytes)
+
+    def snapshot(self):
+        """Save the whole table now and start a new log"""
+        if self._wal is not None:
+            with self._lock:
+                self._snapshot()
+
+    def close(self):
+        if self._wal is not None:
+            with self._lock, self._sync_lock:
+                self._wal.flush()
+                os.fsync(self._wal.fileno())
+                self._wal.close()
+                self._wal = None
+
+
+# Data storage: users live in memory; NOTES_DB_PATH=notes.db keeps notes
+# across restarts (notes.db.wal + notes.db.snapshot)
 users = {}
-notes = {}
-note_id_counter = 1
+NOTES_DB_PATH = os.environ.get('NOTES_DB_PATH')
+NOTES_FSYNC = os.environ.get('NOTES_FSYNC', 'group')
+notes = DurableDict(NOTES_DB_PATH, fsync=NOTES_FSYNC)
+note_id_counter = max(notes, default=0) + 1
+# Per-owner index: owner -> note ids in creation order (rebuilt from recovered notes)
+notes_by_owner = {}
+for _note_id in sorted(notes):
+    notes_by_owner.setdefault(notes[_note_id]['owner'], []).append(_note_id)
+# Counters behind the ETags: note id -> revision (bumped by every save), and
+# owner -> the value of the store-wide write counter (notes_version) at the
+# last change to that owner's notes. Each write takes a fresh counter value, so
+# two owners never share a version unless neither has any notes. They live in
+# memory, so every start gets a new epoch and ETags from before a restart
+# never match.
+STORE_EPOCH = secrets.token_hex(4)
+note_revisions = {}
+notes_version = 0
+owner_versions = {}
 
 # API version information
 API_VERSIONS = {
@@ -52,6 +307,54 @@ def add_version_headers(response, version):
     return response
 
 
+def save_note(note):
+    """
+    Store a note and keep the per-owner index in sync.
+
+    Used by every create and update path, so listing a user's notes never
+    needs to scan the notes of other users. Also bumps the note's revision
+    and the owner versions behind the ETags.
+    """
+    global notes_version
+    previous = notes.get(note['id'])
+    if previous is None:
+        note_revisions[note['id']] = 1
+    else:
+        # Notes recovered from disk start at revision 1
+        note_revisions[note['id']] = note_revisions.get(note['id'], 1) + 1
+
+    if previous is not None and previous['owner'] != note['owner']:
+        notes_by_owner[previous['owner']].remove(note['id'])
+        notes_version += 1
+        owner_versions[previous['owner']] = notes_version
+        previous = None
+
+    notes[note['id']] = note
+    if previous is None:
+        notes_by_owner.setdefault(note['owner'], []).append(note['id'])
+    notes_version += 1
+    owner_versions[note['owner']] = notes_version
+
+
+def get_user_notes(owner, start=0, end=None):
+    """Return a user's notes in creation order, optionally sliced [start:end]"""
+    return [notes[note_id] for note_id in notes_by_owner.get(owner, [])[start:end]]
+
+
+def note_etag(note_id):
+    """Strong ETag of a note, built from its revision instead of its content"""
+    return f'{STORE_EPOCH}-{note_id}-{note_revisions.get(note_id, 1)}'
+
+
+def not_modified(etag):
+    """304 response if the client's copy (If-None-Match) is still current, else None"""
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = make_response('', 304)
+    response.set_etag(etag)
+    return response
+
+
 # ==================== Authentication Routes (Version-agnostic) ====================
 
 @app.route('/auth/register', methods=['POST'])
@@ -106,7 +409,7 @@ def get_notes_v1():
     Returns a simple list of notes
     """
     current_user = get_jwt_identity()
-    user_notes = [note for note in notes.values() if note['owner'] == current_user]
+    user_notes = get_user_notes(current_user)
 
     response = make_response(jsonify(user_notes))
     response = add_version_headers(response, 'v1')
@@ -135,7 +438,7 @@ def create_note_v1():
         'owner': current_user
     }
 
-    notes[note_id_counter] = note
+    save_note(note)
     note_id_counter += 1
 
     response = make_response(jsonify(note), 201)
@@ -181,26 +484,36 @@ def get_notes_v2():
     """
     current_user = get_jwt_identity()
 
+    # The listing is per user: the ETag follows this user's notes only, and
+    # Vary: Authorization keeps caches from serving it to another account
+    etag = f'{STORE_EPOCH}-{owner_versions.get(current_user, 0)}'
+    cached = not_modified(etag)
+    if cached is not None:
+        cached.vary.add('Authorization')
+        return add_version_headers(cached, 'v2')
+
     # Get pagination parameters
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
 
-    # Filter notes by owner
-    user_notes = [note for note in notes.values() if note['owner'] == current_user]
-
     # Calculate pagination
     start = (page - 1) * per_page
     end = start + per_page
-    paginated_notes = user_notes[start:end]
+
+    # Slice only this user's notes (per-owner index, no scan over all notes)
+    paginated_notes = get_user_notes(current_user, start, end)
+    total_notes = len(notes_by_owner.get(current_user, ()))
 
     response_data = {
         'data': paginated_notes,
-        'count': len(user_notes),
+        'count': total_notes,
         'page': page,
         'per_page': per_page
     }
 
     response = make_response(jsonify(response_data))
+    response.set_etag(etag)
+    response.vary.add('Authorization')
     response = add_version_headers(response, 'v2')
 
     return response
@@ -234,12 +547,13 @@ def create_note_v2():
         'updated_at': datetime.utcnow().isoformat()
     }
 
-    notes[note_id_counter] = note
+    save_note(note)
     note_id_counter += 1
 
     response_data = {'data': note, 'message': 'Note created successfully'}
 
     response = make_response(jsonify(response_data), 201)
+    response.set_etag(note_etag(note['id']))
     response = add_version_headers(response, 'v2')
 
     return response
@@ -265,9 +579,16 @@ def get_note_v2(note_id):
     if note['owner'] != current_user:
         return jsonify({'error': 'Unauthorized'}), 403
 
+    # Polling clients that already have this revision get an empty 304
+    etag = note_etag(note_id)
+    cached = not_modified(etag)
+    if cached is not None:
+        return add_version_headers(cached, 'v2')
+
     response_data = {'data': note}
 
     response = make_response(jsonify(response_data))
+    response.set_etag(etag)
     response = add_version_headers(response, 'v2')
 
     return response
@@ -278,6 +599,9 @@ def get_note_v2(note_id):
 def update_note_v2(note_id):
     """
     Version 2: Update a note (new endpoint, not in v1)
+
+    Send the note's ETag in If-Match to fail with 412 instead of overwriting
+    someone else's changes.
     """
     current_user = get_jwt_identity()
 
@@ -289,22 +613,34 @@ def update_note_v2(note_id):
     if note['owner'] != current_user:
         return jsonify({'error': 'Unauthorized'}), 403
 
+    # Optimistic concurrency: with If-Match, only update the revision the
+    # client last saw, so concurrent edits aren't silently overwritten
+    if request.if_match and not request.if_match.contains(note_etag(note_id)):
+        return jsonify({'error': 'Precondition Failed',
+                        'message': 'Note was modified since it was fetched; GET it again and retry'}), 412
+
     data = request.get_json()
 
+    # Edit a copy: DurableDict logs assignments, not in-place changes, so the
+    # stored note only changes when save_note() does notes[note_id] = updated
+    updated = dict(note)
+
     # Update fields
     if 'title' in data:
-        note['title'] = data['title']
+        updated['title'] = data['title']
     if 'content' in data:
-        note['content'] = data['content']
+        updated['content'] = data['content']
     if 'tags' in data:
-        note['tags'] = data['tags']
+        updated['tags'] = data['tags']
 
     # Update timestamp
-    note['updated_at'] = datetime.utcnow().isoformat()
+    updated['updated_at'] = datetime.utcnow().isoformat()
+    save_note(updated)
 
-    response_data = {'data': note, 'message': 'Note updated successfully'}
+    response_data = {'data': updated, 'message': 'Note updated successfully'}
 
     response = make_response(jsonify(response_data))
+    response.set_etag(note_etag(note_id))
     response = add_version_headers(response, 'v2')
 
     return response
@@ -0,0 +1,67 @@
+"""
+Benchmark: revocation check cost with 10M revoked tokens
+
+Fills a file-backed TokenDenylist with REVOKED random jtis, then measures
+the per-lookup cost of the check that runs on every @jwt_required request:
+- a token that was never revoked (the common case, answered by the Bloom filter)
+- a revoked token (Bloom filter hit confirmed by the SQLite table)
+It also reports the observed false positive rate and the memory the Bloom
+filter uses, next to the size of a plain Python set of the same jtis
+(extrapolated from 1M entries). Filling the table takes a few minutes.
+
+Run:
+    python benchmark14.py
+"""
+import os
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+from example14 import TokenDenylist
+
+REVOKED = 10_000_000
+BATCH = 100_000
+LOOKUPS = 100_000
+
+
+def per_lookup_us(denylist, jtis):
+    start = time.perf_counter()
+    for jti in jtis:
+        jti in denylist
+    return (time.perf_counter() - start) / len(jtis) * 1e6
+
+
+def python_set_bytes(n):
+    tracemalloc.start()
+    jtis = {uuid.uuid4().hex for _ in range(n)}
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del jtis
+    return size
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'revoked.db')
+        denylist = TokenDenylist(path, capacity=REVOKED)
+        expires_at = time.time() + 3600
+
+        start = time.perf_counter()
+        sample = []
+        for _ in range(REVOKED // BATCH):
+            batch = [(uuid.uuid4().hex, expires_at) for _ in range(BATCH)]
+            denylist.revoke_many(batch)
+            sample.extend(jti for jti, _ in batch[:LOOKUPS // (REVOKED // BATCH)])
+        print(f"revoked {REVOKED:,} tokens in {time.perf_counter() - start:.1f} s")
+
+        fresh = [uuid.uuid4().hex for _ in range(LOOKUPS)]
+        false_positives = sum(jti in denylist._bloom for jti in fresh)
+
+        print(f"  lookup, not revoked : {per_lookup_us(denylist, fresh):6.2f} us")
+        print(f"  lookup, revoked     : {per_lookup_us(denylist, sample):6.2f} us")
+        print(f"  false positive rate : {false_positives / LOOKUPS:.3%} "
+              f"(target {denylist.error_rate:.0%}, each one costs a SQLite lookup)")
+        print(f"  Bloom filter memory : {len(denylist._bloom.bits) / 2**20:6.1f} MiB")
+        print(f"  SQLite file on disk : {os.path.getsize(path) / 2**20:6.1f} MiB")
+        print(f"  Python set (approx.): {python_set_bytes(1_000_000) * REVOKED / 1_000_000 / 2**20:6.1f} MiB")
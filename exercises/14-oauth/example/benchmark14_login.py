@@ -0,0 +1,81 @@
+"""
+Benchmark: OAuth login throughput and latency against a stand-in provider
+
+Starts stub_provider14.py in a background thread, points example14.py at it
+and logs USERS accounts in LOGINS_PER_USER times each (one browser session,
+i.e. test client, per user). Each login is GET /login/github followed by the
+/callback the provider would redirect to; the callback exchanges the code for
+a token and fetches the profile. Three configurations are compared:
+- no pool, no cache: a new connection per upstream call, full /user responses
+- pool: upstream connections are reused
+- pool + cache: repeat logins get a 304 for /user
+
+Run:
+    python benchmark14_login.py
+"""
+import logging
+import os
+import statistics
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import stub_provider14
+
+STUB_PORT = 5082
+os.environ['GITHUB_OAUTH_URL'] = f'http://127.0.0.1:{STUB_PORT}'
+os.environ['GITHUB_API_URL'] = f'http://127.0.0.1:{STUB_PORT}'
+
+import example14  # noqa: E402  (must be imported after GITHUB_*_URL are set)
+
+USERS = 20
+LOGINS_PER_USER = 5
+
+
+def login(client, username):
+    response = client.get('/login/github')
+    assert response.status_code == 302
+    state = parse_qs(urlsplit(response.headers['Location']).query)['state'][0]
+    # The stand-in provider auto-approves: go straight to the callback
+    response = client.get(f'/callback?code=code-{username}&state={state}')
+    assert response.status_code == 200, response.get_json()
+
+
+def run(label, pool, cache):
+    example14.OAUTH_HTTP_POOL = pool
+    example14.PROFILE_CACHE_ENABLED = cache
+    example14.github_profiles.clear()
+    example14.http_adapter.close()
+    for name in stub_provider14.stats:
+        stub_provider14.stats[name] = 0
+
+    clients = {f'user{i}': example14.app.test_client() for i in range(USERS)}
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(LOGINS_PER_USER):
+        for username, client in clients.items():
+            started = time.perf_counter()
+            login(client, username)
+            latencies.append(time.perf_counter() - started)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    stats = stub_provider14.stats
+    print(f"{label:<16} | {len(latencies) / elapsed:6.1f} logins/s | p50 {p50:7.2f} ms | "
+          f"p99 {p99:7.2f} ms | connections {stats['connections']:4} | 304s {stats['not_modified']:4}")
+
+
+if __name__ == '__main__':
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = stub_provider14.serve(STUB_PORT)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    print(f"{USERS} users x {LOGINS_PER_USER} logins, "
+          f"{stub_provider14.UPSTREAM_LATENCY * 1000:.0f} ms per upstream call, "
+          f"{stub_provider14.CONNECT_LATENCY * 1000:.0f} ms per new connection")
+    run('no pool, no cache', pool=False, cache=False)
+    run('pool', pool=True, cache=False)
+    run('pool + cache', pool=True, cache=True)
+    server.shutdown()
@@ -1,8 +1,19 @@
 from flask import Flask, request, jsonify, redirect, url_for, session
-from authlib.integrations.flask_client import OAuth
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+from authlib.integrations.flask_client import OAuth, FlaskOAuth2App
+from authlib.integrations.requests_client import OAuth2Session
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity, get_jwt
+from flask_jwt_extended import verify_jwt_in_request
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
 from datetime import timedelta
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
+import hashlib
+import math
 import os
+import sqlite3
+import threading
+import time
 
 app = Flask(__name__)
 
@@ -15,25 +26,233 @@ app.config['JWT_SECRET_KEY'] = 'your-jwt-secret-key-change-in-production'
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=1)
 jwt = JWTManager(app)
 
+# ==================== Token Revocation ====================
+#
+# A JWT stays valid until its 'exp', so logging out means remembering the
+# token's 'jti' and rejecting it on every @jwt_required request. Almost no
+# token that reaches the API has been revoked, so the check starts with a
+# Bloom filter: a small bit array that answers "definitely not revoked"
+# without touching the exact list. Only Bloom hits (revoked tokens plus
+# ~REVOKED_TOKENS_ERROR_RATE false positives) look up the exact jti -> exp
+# table, which lives in SQLite: in memory, or in REVOKED_TOKENS_FILE so
+# revocations survive a restart. Rows are purged once their token expires.
+REVOKED_TOKENS_FILE = os.environ.get('REVOKED_TOKENS_FILE', ':memory:')
+REVOKED_TOKENS_CAPACITY = int(os.environ.get('REVOKED_TOKENS_CAPACITY', 1_000_000))
+REVOKED_TOKENS_ERROR_RATE = float(os.environ.get('REVOKED_TOKENS_ERROR_RATE', 0.01))
+REVOKED_TOKENS_PURGE_INTERVAL = int(os.environ.get('REVOKED_TOKENS_PURGE_INTERVAL', 300))
+
+
+class BloomFilter:
+    """
+    Fixed-size set of strings with no false negatives.
+
+    Sized for `capacity` items at `error_rate` false positives; adding more
+    items keeps it correct but raises the false positive rate.
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        # Double hashing: k positions from one 128-bit digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class TokenDenylist:
+    """
+    Revoked token ids (jti) with their expiry: a BloomFilter in front of an
+    exact SQLite table. Lookups of tokens that were never revoked only read
+    the Bloom filter.
+    """
+
+    def __init__(self, path=':memory:', capacity=REVOKED_TOKENS_CAPACITY,
+                 error_rate=REVOKED_TOKENS_ERROR_RATE, purge_interval=REVOKED_TOKENS_PURGE_INTERVAL):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.purge_interval = purge_interval
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS revoked_tokens '
+                           '(jti TEXT PRIMARY KEY, expires_at REAL NOT NULL) WITHOUT ROWID')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS revoked_tokens_expires_at '
+                           'ON revoked_tokens (expires_at)')
+        self._bloom = None
+        self._bloom_items = 0
+        self._stale_items = 0
+        with self._lock:
+            self._purge(time.time())
+
+    def _purge(self, now):
+        # Expired rows are useless: the token itself is rejected by now
+        with self._conn:
+            self._stale_items += self._conn.execute(
+                'DELETE FROM revoked_tokens WHERE expires_at <= ?', (now,)).rowcount
+        # A Bloom filter cannot forget, so it is rebuilt from the remaining
+        # rows once expired entries make up half of it
+        if self._bloom is None or self._stale_items * 2 > self._bloom_items:
+            bloom = BloomFilter(self.capacity, self.error_rate)
+            count = 0
+            for (jti,) in self._conn.execute('SELECT jti FROM revoked_tokens'):
+                bloom.add(jti)
+                count += 1
+            self._bloom, self._bloom_items, self._stale_items = bloom, count, 0
+        self._next_purge = now + self.purge_interval
+
+    def revoke(self, jti, expires_at):
+        """Reject `jti` until `expires_at` (epoch seconds, the token's exp)"""
+        self.revoke_many([(jti, expires_at)])
+
+    def revoke_many(self, tokens):
+        """Revoke an iterable of (jti, expires_at) pairs in one transaction"""
+        now = time.time()
+        with self._lock:
+            if now >= self._next_purge:
+                self._purge(now)
+            tokens = list(tokens)
+            with self._conn:
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO revoked_tokens (jti, expires_at) VALUES (?, ?)', tokens)
+            for jti, _ in tokens:
+                self._bloom.add(jti)
+            self._bloom_items += len(tokens)
+
+    def __contains__(self, jti):
+        if jti not in self._bloom:
+            return False
+        with self._lock:
+            row = self._conn.execute('SELECT expires_at FROM revoked_tokens WHERE jti = ?',
+                                     (jti,)).fetchone()
+        return row is not None and row[0] > time.time()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM revoked_tokens').fetchone()[0]
+
+
+revoked_tokens = TokenDenylist(REVOKED_TOKENS_FILE)
+
+
+@jwt.token_in_blocklist_loader
+def is_token_revoked(jwt_header, jwt_payload):
+    """Called by flask_jwt_extended on every @jwt_required request"""
+    return jwt_payload['jti'] in revoked_tokens
+
+
+# ==================== Pooled HTTP Client ====================
+#
+# Authlib builds (and closes) a new requests session for every call, so each
+# token exchange and profile fetch would open a new TCP + TLS connection to
+# GitHub. PooledOAuth2Session sends them all through one shared adapter
+# instead, which keeps connections alive across logins.
+# GITHUB_OAUTH_URL / GITHUB_API_URL let you point the app at a local stand-in
+# provider (see example/stub_provider14.py).
+GITHUB_OAUTH_URL = os.environ.get('GITHUB_OAUTH_URL', 'https://github.com')
+GITHUB_API_URL = os.environ.get('GITHUB_API_URL', 'https://api.github.com')
+OAUTH_HTTP_POOL = os.environ.get('OAUTH_HTTP_POOL', '1') != '0'
+http_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32)
+
+
+class PooledOAuth2Session(OAuth2Session):
+    """OAuth2Session that reuses the connections of the shared http_adapter"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if OAUTH_HTTP_POOL:
+            self.mount('https://', http_adapter)
+            self.mount('http://', http_adapter)
+
+    def close(self):
+        # Closing one session must not drop the shared pool's connections
+        for adapter in self.adapters.values():
+            if adapter is not http_adapter:
+                adapter.close()
+
+
+class PooledOAuth2App(FlaskOAuth2App):
+    client_cls = PooledOAuth2Session
+
+
+class PooledOAuth(OAuth):
+    oauth2_client_cls = PooledOAuth2App
+
+
 # OAuth Configuration
-oauth = OAuth(app)
+oauth = PooledOAuth(app)
 
 # Register GitHub as an OAuth provider
 github = oauth.register(
     name='github',
     client_id=os.getenv('GITHUB_CLIENT_ID', 'Ov23ct2hCM0q3nQk0aMq'),
     client_secret=os.getenv('GITHUB_CLIENT_SECRET', '6dd1fe3248335ad88262ba6e9baa50e93ab2a513'),
-    access_token_url='https://github.com/login/oauth/access_token',
+    access_token_url=f'{GITHUB_OAUTH_URL}/login/oauth/access_token',
     access_token_params=None,
-    authorize_url='https://github.com/login/oauth/authorize',
+    authorize_url=f'{GITHUB_OAUTH_URL}/login/oauth/authorize',
     authorize_params=None,
-    api_base_url='https://api.github.com/',
+    api_base_url=f'{GITHUB_API_URL}/',
     client_kwargs={'scope': 'user:email'},
 )
 
 # In-memory user database
 users = {}
 
+# ==================== GitHub Profile Cache ====================
+#
+# GitHub answers GET /user with an ETag. Repeat logins send it back in
+# If-None-Match: an unchanged profile comes back as an empty 304 (which GitHub
+# does not count against the rate limit) and the cached copy is reused. While
+# signed in, the browser session remembers its GitHub login, so the callback
+# knows whose ETag to send before it has fetched the profile; /logout clears it,
+# so the first login after a logout fetches the full profile. A token of a
+# different account gets a different body and ETag, so it never matches. At
+# most GITHUB_PROFILE_CACHE_SIZE profiles are kept, least recently used evicted
+# first.
+PROFILE_CACHE_ENABLED = os.environ.get('GITHUB_PROFILE_CACHE', '1') != '0'
+PROFILE_CACHE_SIZE = int(os.environ.get('GITHUB_PROFILE_CACHE_SIZE', 10_000))
+github_profiles = OrderedDict()  # login -> (etag, user_info)
+github_profiles_lock = threading.Lock()
+
+
+def fetch_github_profile(login_hint=None):
+    """Fetch the profile of the current OAuth token, conditional on the cached ETag"""
+    cached = None
+    if PROFILE_CACHE_ENABLED and login_hint:
+        with github_profiles_lock:
+            cached = github_profiles.get(login_hint)
+            if cached:
+                github_profiles.move_to_end(login_hint)
+    headers = {'If-None-Match': cached[0]} if cached else {}
+
+    response = github.get('user', headers=headers)
+    if cached and response.status_code == 304:
+        return cached[1]
+    response.raise_for_status()
+
+    user_info = response.json()
+    etag = response.headers.get('ETag')
+    if PROFILE_CACHE_ENABLED and etag:
+        with github_profiles_lock:
+            github_profiles[user_info.get('login')] = (etag, user_info)
+            github_profiles.move_to_end(user_info.get('login'))
+            while len(github_profiles) > PROFILE_CACHE_SIZE:
+                github_profiles.popitem(last=False)
+    return user_info
+
+
 @app.route('/')
 def home():
     """
@@ -50,7 +269,7 @@ def home():
             'GET /callback': 'OAuth callback (handled automatically)',
             'GET /profile': 'Get user profile (requires JWT)',
             'GET /users': 'List all users (requires JWT)',
-            'POST /logout': 'Logout (clears session)'
+            'POST /logout': 'Logout (clears session, revokes the JWT)'
         },
         'flow': [
             '1. Visit /login/github in browser',
@@ -99,9 +318,8 @@ def callback():
         # Exchange authorization code for access token
         token = github.authorize_access_token()
 
-        # Fetch user profile from GitHub API
-        response = github.get('user')
-        user_info = response.json()
+        # Fetch user profile from GitHub API (a 304 reuses the cached copy)
+        user_info = fetch_github_profile(session.get('github_login'))
 
         # Extract user data from GitHub response
         github_id = user_info.get('id')
@@ -111,14 +329,14 @@ def callback():
         avatar_url = user_info.get('avatar_url')
 
         # Store or update user in database
-        if username not in users:
-            users[username] = {
-                'github_id': github_id,
-                'username': username,
-                'email': email,
-                'name': name,
-                'avatar_url': avatar_url
-            }
+        users[username] = {
+            'github_id': github_id,
+            'username': username,
+            'email': email,
+            'name': name,
+            'avatar_url': avatar_url
+        }
+        session['github_login'] = username
 
         # Create a JWT token for the user
         access_token = create_access_token(identity=username)
@@ -193,18 +411,27 @@ def get_users():
 @app.route('/logout', methods=['POST'])
 def logout():
     """
-    Logout endpoint (clears session).
+    Logout endpoint (clears session and revokes the JWT).
 
-    Note: With JWT, true logout requires token blacklisting.
-    This is a simplified version that just clears the session.
+    If the request carries a valid JWT (Authorization: Bearer <token>), its
+    jti is added to revoked_tokens, so the token is rejected from now on even
+    though it has not expired yet. An expired, revoked or malformed token has
+    nothing left to revoke and does not stop the logout.
 
     Returns:
         200: Logout confirmation
     """
     session.clear()
+    try:
+        verify_jwt_in_request(optional=True)
+        claims = get_jwt()
+    except (JWTExtendedException, PyJWTError):
+        claims = {}
+    if claims:
+        revoked_tokens.revoke(claims['jti'], claims['exp'])
     return jsonify({
         'message': 'Logged out successfully',
-        'note': 'JWT tokens remain valid until expiration. Implement token blacklisting for true logout.'
+        'token_revoked': bool(claims)
     }), 200
 
 
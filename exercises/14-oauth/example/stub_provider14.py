@@ -0,0 +1,141 @@
+"""
+Local stand-in for the GitHub OAuth provider and the GitHub /user API
+
+Auto-approves every authorization request, issues random access tokens and
+serves deterministic profiles with an ETag (answering If-None-Match with 304),
+so the OAuth login flow can be exercised and benchmarked offline. Every
+response pays UPSTREAM_LATENCY and every new connection pays CONNECT_LATENCY,
+which stands in for the TCP + TLS handshake with github.com.
+
+Run:
+    python stub_provider14.py            # listens on http://127.0.0.1:5002
+    GITHUB_OAUTH_URL=http://127.0.0.1:5002 GITHUB_API_URL=http://127.0.0.1:5002 python example14.py
+"""
+import hashlib
+import json
+import secrets
+import socket
+import threading
+import time
+import zlib
+from socketserver import ThreadingMixIn
+from urllib.parse import urlencode
+from wsgiref.simple_server import ServerHandler, WSGIRequestHandler, WSGIServer, make_server
+
+from flask import Flask, Response, jsonify, redirect, request
+
+app = Flask(__name__)
+
+# Artificial latency added to every response (seconds)
+UPSTREAM_LATENCY = 0.02
+# Artificial latency added once per new connection (seconds)
+CONNECT_LATENCY = 0.05
+
+# Counters read by the benchmarks
+stats = {'connections': 0, 'token': 0, 'user': 0, 'not_modified': 0}
+_stats_lock = threading.Lock()
+
+# access token -> GitHub login
+tokens = {}
+
+
+def _count(name):
+    with _stats_lock:
+        stats[name] += 1
+
+
+class KeepAliveServerHandler(ServerHandler):
+    http_version = '1.1'
+
+
+class StubRequestHandler(WSGIRequestHandler):
+    """
+    HTTP/1.1 keep-alive handler that charges CONNECT_LATENCY per connection.
+
+    Both werkzeug's dev server and wsgiref close the connection after every
+    response, which would hide the cost of opening new connections.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        # Headers and body are separate writes: without TCP_NODELAY, Nagle's
+        # algorithm delays the body of kept-alive responses
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        _count('connections')
+        time.sleep(CONNECT_LATENCY)
+
+    def handle(self):
+        self.close_connection = False
+        while not self.close_connection:
+            self.raw_requestline = self.rfile.readline(65537)
+            if not self.raw_requestline or not self.parse_request():
+                return
+            handler = KeepAliveServerHandler(self.rfile, self.wfile, self.get_stderr(),
+                                             self.get_environ(), multithread=True)
+            handler.request_handler = self
+            handler.run(self.server.get_app())
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+@app.route('/login/oauth/authorize', methods=['GET'])
+def authorize():
+    # No consent screen: ?login= picks the GitHub account (default "octocat")
+    login = request.args.get('login', 'octocat')
+    query = urlencode({'code': f'code-{login}', 'state': request.args.get('state', '')})
+    return redirect(f"{request.args['redirect_uri']}?{query}")
+
+
+@app.route('/login/oauth/access_token', methods=['POST'])
+def access_token():
+    _count('token')
+    time.sleep(UPSTREAM_LATENCY)
+    code = request.form.get('code', '')
+    if not code.startswith('code-'):
+        # Like GitHub, errors come back with a 200 status
+        return jsonify({'error': 'bad_verification_code'}), 200
+
+    token = f'gho_{secrets.token_hex(16)}'
+    tokens[token] = code[len('code-'):]
+    return jsonify({'access_token': token, 'token_type': 'bearer', 'scope': 'user:email'}), 200
+
+
+@app.route('/user', methods=['GET'])
+def user():
+    _count('user')
+    time.sleep(UPSTREAM_LATENCY)
+    token = request.headers.get('Authorization', '').partition(' ')[2]
+    login = tokens.get(token)
+    if login is None:
+        return jsonify({'message': 'Bad credentials'}), 401
+
+    body = json.dumps({
+        'id': zlib.crc32(login.encode()),
+        'login': login,
+        'name': login.title(),
+        'email': f'{login}@example.com',
+        'avatar_url': f'https://avatars.example.com/{login}.png'
+    }, sort_keys=True)
+    etag = f'"{hashlib.sha1(body.encode()).hexdigest()}"'
+    if request.headers.get('If-None-Match') == etag:
+        _count('not_modified')
+        return Response(status=304, headers={'ETag': etag})
+    return Response(body, mimetype='application/json', headers={'ETag': etag})
+
+
+def serve(port):
+    """Create a threaded keep-alive server for the stub (call serve_forever())"""
+    return make_server('127.0.0.1', port, app, server_class=ThreadingWSGIServer,
+                       handler_class=StubRequestHandler)
+
+
+if __name__ == '__main__':
+    print('Stand-in GitHub provider at http://127.0.0.1:5002')
+    serve(5002).serve_forever()
@@ -0,0 +1,84 @@
+"""
+Benchmark: marshalling pages of books with marshal() and the compiled book_model
+
+Times both serializers on pages of PAGE_SIZES books:
+- marshal:  flask_restx.marshal(page, book_model), the field-by-field walk
+- compiled: marshal_book(page), the function compile_marshaller() generated
+then the whole GET /api/books?limit=1000 request with FAST_MARSHAL on and off.
+Before timing, both outputs are dumped to JSON and checked to be byte-identical,
+including books with missing fields, None values and values of the wrong type.
+
+Run:
+    python benchmark_marshal.py
+"""
+import json
+import time
+
+from flask_restx import marshal
+
+import documented_api
+from documented_api import book_index, book_model, books, marshal_book
+
+PAGE_SIZES = [10, 100, 1000]
+RUNS = 5
+REQUESTS = 50
+
+
+def fill_catalog(count):
+    for book in books.values():
+        book_index.remove(book)
+    books.clear()
+    for book_id in range(1, count + 1):
+        books[book_id] = {'id': book_id, 'title': f'Book {book_id}', 'author': f'Author {book_id % 97}',
+                          'year': 1900 + book_id % 125, 'isbn': f'978-{book_id:010d}'}
+        book_index.add(books[book_id])
+    documented_api.next_id = count + 1
+
+
+def check_identical():
+    odd_books = [
+        {'id': 1, 'title': 'Only a title'},                                   # missing fields
+        {'id': 2, 'title': None, 'author': None, 'year': None, 'isbn': None},
+        {'id': '3', 'title': 1984, 'author': 'A', 'year': 1949.9, 'isbn': 9780451524935},
+        {'id': 4, 'title': 'Extra', 'author': 'B', 'year': 2000, 'isbn': None, 'price': 9.5},
+    ]
+    for data in (odd_books, list(books.values())[:1000], books[1]):
+        expected = json.dumps(marshal(data, book_model))
+        assert json.dumps(marshal_book(data)) == expected, data
+
+
+def best_seconds(function, *args):
+    timings = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def request_ms(client):
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        assert client.get('/api/books?limit=1000').status_code == 200
+    return (time.perf_counter() - start) / REQUESTS * 1000
+
+
+if __name__ == '__main__':
+    fill_catalog(max(PAGE_SIZES))
+    check_identical()
+
+    print(f"{'page':>6} | {'marshal':>14} | {'compiled':>14} | {'speedup':>7}")
+    print('-' * 51)
+    for size in PAGE_SIZES:
+        page = [books[book_id] for book_id in range(1, size + 1)]
+        # Repeat small pages so every measurement serializes 10,000 books
+        repeat = 10_000 // size
+        slow = best_seconds(lambda: [marshal(page, book_model) for _ in range(repeat)])
+        fast = best_seconds(lambda: [marshal_book(page) for _ in range(repeat)])
+        print(f"{size:>6} | {10_000 / slow:>9,.0f} bk/s | {10_000 / fast:>9,.0f} bk/s | {slow / fast:>6.1f}x")
+
+    client = documented_api.app.test_client()
+    print("\nGET /api/books?limit=1000")
+    for fast_marshal in (False, True):
+        documented_api.FAST_MARSHAL = fast_marshal
+        print(f"  FAST_MARSHAL={int(fast_marshal)}: {request_ms(client):.2f} ms")
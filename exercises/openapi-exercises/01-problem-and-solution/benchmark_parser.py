@@ -0,0 +1,86 @@
+"""
+Benchmark: query-string parsing overhead of GET /api/books
+
+A list-heavy workload of QUERIES query strings (author and title searches,
+page/limit combinations, no filters) is parsed three ways:
+- per request: the old code, a new api.parser() with its four add_argument()
+               calls for every request, then parse_args()
+- hoisted:     book_list_parser.parse_args(), built once at import
+- fast path:   parse_book_list_args(), what BookList.get uses now
+All three must return the same arguments. Then the whole GET requests are
+timed through the test client with the old handler and the current one.
+
+Run:
+    python benchmark_parser.py
+"""
+import random
+import time
+
+import documented_api
+from documented_api import api, app, book_list_parser, parse_book_list_args
+
+QUERIES = 20_000
+REQUESTS = 5_000
+
+
+def per_request_parser():
+    parser = api.parser()
+    parser.add_argument('author', type=str, help='Filter by author name')
+    parser.add_argument('title', type=str, help='Filter by title')
+    parser.add_argument('page', type=int, default=1, help='Page number')
+    parser.add_argument('limit', type=int, default=10, help='Books per page')
+    return parser.parse_args()
+
+
+def hoisted_parser():
+    return book_list_parser.parse_args()
+
+
+def query_strings():
+    rng = random.Random(7)
+    choices = [
+        lambda: '',
+        lambda: f'page={rng.randrange(1, 50)}',
+        lambda: f'page={rng.randrange(1, 50)}&limit={rng.choice([10, 25, 100])}',
+        lambda: f'author={rng.choice(["orwell", "lee", "fitz", "ha"])}',
+        lambda: f'title={rng.choice(["great", "1984", "mock"])}&limit=5',
+    ]
+    return [rng.choice(choices)() for _ in range(QUERIES)]
+
+
+def parse_us(parse, queries):
+    elapsed = 0.0
+    for query in queries:
+        with app.test_request_context(f'/api/books?{query}'):
+            start = time.perf_counter()
+            parse()
+            elapsed += time.perf_counter() - start
+    return elapsed / len(queries) * 1e6
+
+
+def requests_per_second(queries):
+    client = app.test_client()
+    start = time.perf_counter()
+    for query in queries[:REQUESTS]:
+        assert client.get(f'/api/books?{query}').status_code == 200
+    return REQUESTS / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    queries = query_strings()
+    for query in queries[:500]:
+        with app.test_request_context(f'/api/books?{query}'):
+            expected = dict(per_request_parser())
+            assert dict(hoisted_parser()) == expected
+            assert parse_book_list_args() == expected
+
+    print(f"{QUERIES:,} GET /api/books query strings, parsing only")
+    for label, parse in (('per request', per_request_parser), ('hoisted', hoisted_parser),
+                         ('fast path', parse_book_list_args)):
+        print(f"  {label:<12}: {parse_us(parse, queries):6.1f} us/request")
+
+    print(f"\n{REQUESTS:,} whole requests through the test client")
+    documented_api.parse_book_list_args = per_request_parser
+    print(f"  per request : {requests_per_second(queries):8,.0f} requests/s")
+    documented_api.parse_book_list_args = parse_book_list_args
+    print(f"  fast path   : {requests_per_second(queries):8,.0f} requests/s")
@@ -0,0 +1,96 @@
+"""
+Benchmark: author/title search over a 1M-book synthetic catalog
+
+Fills documented_api.py with BOOKS generated books (made-up authors and
+titles from a fixed seed), then times each query two ways:
+- scan:  the old filter, a substring test against every book
+- index: book_index.search() through the trigram indexes
+and finally the whole GET /api/books?author=... request via the test client.
+Also reports how long the indexes take to build and the memory they use.
+
+Run:
+    python benchmark_search.py
+"""
+import random
+import resource
+import time
+
+import documented_api
+from documented_api import book_index, books
+
+BOOKS = 1_000_000
+RUNS = 5
+
+SYLLABLES = ['an', 'bel', 'cor', 'da', 'el', 'fin', 'gar', 'hol', 'is', 'jun', 'kar', 'lo',
+             'mar', 'nor', 'os', 'per', 'quin', 'ros', 'sten', 'tor', 'ul', 'van', 'wes', 'yor']
+WORDS = ['river', 'night', 'garden', 'shadow', 'empire', 'winter', 'secret', 'silver', 'ocean',
+         'house', 'storm', 'letter', 'island', 'mirror', 'forest', 'crown', 'voyage', 'memory']
+
+
+def name(rng, parts):
+    return ''.join(rng.choice(SYLLABLES) for _ in range(parts)).title()
+
+
+def fill_catalog():
+    rng = random.Random(42)
+    authors = [f'{name(rng, 2)} {name(rng, 3)}' for _ in range(200_000)]
+    for book in books.values():
+        book_index.remove(book)
+    books.clear()
+    for book_id in range(1, BOOKS + 1):
+        title = ' '.join(rng.choice(WORDS) for _ in range(3)).capitalize() + f' {rng.randrange(1000)}'
+        books[book_id] = {'id': book_id, 'title': title, 'author': rng.choice(authors),
+                          'year': rng.randrange(1900, 2025), 'isbn': None}
+    # Plant a few books by a known author
+    for book_id in (1234, 567_890, 999_999):
+        books[book_id]['author'] = 'George Orwell'
+
+
+def scan(author=None, title=None):
+    result = list(books.values())
+    if author:
+        result = [b for b in result if author.lower() in b['author'].lower()]
+    if title:
+        result = [b for b in result if title.lower() in b['title'].lower()]
+    return [b['id'] for b in result]
+
+
+def best_ms(function, *args):
+    timings = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        result = function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000, result
+
+
+if __name__ == '__main__':
+    fill_catalog()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    for book in books.values():
+        book_index.add(book)
+    print(f"{BOOKS:,} books: indexes built in {time.perf_counter() - start:.1f} s, "
+          f"+{(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024:.0f} MiB peak RSS")
+
+    queries = [
+        ('author', 'orwell'),           # 3 books
+        ('author', 'quinsten'),         # a rare syllable pair
+        ('author', 'mar'),              # a common syllable
+        ('author', 'ro'),               # too short for a trigram
+        ('title', 'silver storm'),
+        ('title', 'voyage 42'),
+    ]
+    print(f"\n{'query':<22} | {'matches':>8} | {'scan':>9} | {'index':>9}")
+    print('-' * 57)
+    for field, query in queries:
+        filters = {field: query}
+        scan_ms, expected = best_ms(lambda: scan(**filters))
+        index_ms, found = best_ms(lambda: book_index.search(**filters))
+        assert found == expected
+        print(f"{field + '=' + query:<22} | {len(found):>8,} | {scan_ms:>6.1f} ms | {index_ms:>6.2f} ms")
+
+    client = documented_api.app.test_client()
+    request_ms, response = best_ms(client.get, '/api/books?author=orwell')
+    assert response.status_code == 200 and len(response.get_json()) == 3
+    print(f"\nGET /api/books?author=orwell: {request_ms:.2f} ms")
@@ -0,0 +1,104 @@
+"""
+Author and title search shared by the documented and undocumented Books APIs
+"""
+
+
+class TrigramIndex:
+    """
+    Case-insensitive substring search over one text field.
+
+    Each distinct lowercased value is split into overlapping trigrams
+    ("orwell" -> "orw", "rwe", "wel", "ell"), and every trigram points at the
+    values that contain it. A query intersects the value sets of its own
+    trigrams, smallest first, confirms the few survivors with a real substring
+    test and returns the ids stored under them, so the work follows the
+    number of matches instead of the size of the catalog. Values are indexed
+    once however many books share them (an author with 50 books costs one
+    entry per trigram). Queries shorter than 3 characters have no trigram
+    and scan the distinct values instead.
+    """
+
+    def __init__(self):
+        self._ids = {}    # lowercased value -> ids of the items with that value
+        self._grams = {}  # trigram -> lowercased values containing it
+
+    @staticmethod
+    def _trigrams(text):
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def add(self, item_id, value):
+        if value is None:
+            return
+        key = str(value).lower()
+        ids = self._ids.get(key)
+        if ids is None:
+            ids = self._ids[key] = set()
+            for gram in self._trigrams(key):
+                self._grams.setdefault(gram, set()).add(key)
+        ids.add(item_id)
+
+    def remove(self, item_id, value):
+        if value is None:
+            return
+        key = str(value).lower()
+        ids = self._ids.get(key)
+        if ids is None:
+            return
+        ids.discard(item_id)
+        if not ids:
+            del self._ids[key]
+            for gram in self._trigrams(key):
+                values = self._grams[gram]
+                values.discard(key)
+                if not values:
+                    del self._grams[gram]
+
+    def search(self, query):
+        """Ids of the items whose value contains query (any case)"""
+        query = query.lower()
+        grams = self._trigrams(query)
+        if grams:
+            postings = sorted((self._grams.get(gram, ()) for gram in grams), key=len)
+            candidates = set(postings[0])
+            for values in postings[1:]:
+                if not candidates:
+                    break
+                candidates &= values
+        else:
+            candidates = list(self._ids)
+
+        ids = set()
+        for key in candidates:
+            # Trigrams can all match without the query matching ("abcxbcd" has
+            # every trigram of "abcd"), so confirm each candidate
+            if query in key:
+                ids |= self._ids[key]
+        return ids
+
+
+class BookIndex:
+    """Author and title indexes of one book catalog; books are dicts with id, author and title"""
+
+    def __init__(self, books=()):
+        self.author = TrigramIndex()
+        self.title = TrigramIndex()
+        for book in books:
+            self.add(book)
+
+    def add(self, book):
+        self.author.add(book['id'], book['author'])
+        self.title.add(book['id'], book['title'])
+
+    def remove(self, book):
+        self.author.remove(book['id'], book['author'])
+        self.title.remove(book['id'], book['title'])
+
+    def search(self, author=None, title=None):
+        """Ids of the books matching every given filter (at least one), in catalog order"""
+        matches = None
+        for index, query in ((self.author, author), (self.title, title)):
+            if query:
+                found = index.search(query)
+                matches = found if matches is None else matches & found
+        # Ids grow with every new book, so sorting them restores catalog order
+        return sorted(matches)
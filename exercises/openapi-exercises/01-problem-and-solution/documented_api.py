@@ -3,8 +3,12 @@ Documented Books API using Flask-RESTX
 This API automatically generates Swagger UI documentation at /docs
 """
 
-from flask import Flask
-from flask_restx import Api, Resource, fields
+from flask import Flask, make_response, request
+from flask_restx import Api, Resource, fields, marshal
+from book_search import BookIndex
+import os
+import secrets
+import zlib
 
 app = Flask(__name__)
 
@@ -45,39 +49,190 @@ books = {
 }
 next_id = 4
 
+
+# Search indexes, kept up to date by every create, update and delete
+book_index = BookIndex(books.values())
+
+
+# ETags are built from counters instead of from the serialised book, so a
+# client polling with If-None-Match gets an empty 304 without any marshalling:
+#   a book:     epoch-id-revision  (revision bumped by every update)
+#   book lists: epoch-version      (version bumped by every create/update/delete)
+# The counters live in memory, so every start gets a new epoch and ETags from
+# before a restart never match. An X-Fields mask changes the body, so it is
+# folded into the ETag too (see masked_etag) and responses Vary on it.
+STORE_EPOCH = secrets.token_hex(4)
+book_revisions = {book_id: 1 for book_id in books}
+books_version = 0
+
+
+def book_etag(book_id):
+    return f'{STORE_EPOCH}-{book_id}-{book_revisions[book_id]}'
+
+
+def book_changed(book_id):
+    """Record a create, update or delete: bump the book's revision and the store version"""
+    global books_version
+    if book_id in books:
+        book_revisions[book_id] = book_revisions.get(book_id, 0) + 1
+    else:
+        book_revisions.pop(book_id, None)
+    books_version += 1
+
+
+def masked_etag(etag):
+    """etag, with a digest of this request's X-Fields mask appended if it has one"""
+    mask = request.headers.get(app.config['RESTX_MASK_HEADER'])
+    if not mask:
+        return etag
+    return f'{etag}-{zlib.crc32(mask.encode()):08x}'
+
+
+def etag_headers(etag):
+    """Headers for a response built with this request's X-Fields mask"""
+    return {'ETag': f'"{etag}"', 'Vary': app.config['RESTX_MASK_HEADER']}
+
+
+def matches_if_match(book_id):
+    """If-Match check: any ETag of the book's current revision, whatever its mask"""
+    etag = book_etag(book_id)
+    return request.if_match.star_tag or any(
+        tag == etag or tag.startswith(etag + '-') for tag in request.if_match.as_set())
+
+
+def not_modified(etag):
+    """304 response if the client's copy (If-None-Match) is still current, else None"""
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = make_response('', 304)
+    response.set_etag(etag)
+    response.vary.add(app.config['RESTX_MASK_HEADER'])
+    return response
+
+
+# marshal() walks the model's field objects for every book of every response,
+# which dominates large pages. compile_marshaller() turns a flat model into a
+# generated function that builds the same dict directly: same keys, same order,
+# same str()/int()/float() conversions, so the JSON is byte-identical.
+# Set FAST_MARSHAL=0 to go through marshal() again (e.g. to compare).
+FAST_MARSHAL = os.environ.get('FAST_MARSHAL', '1') != '0'
+
+# Field classes whose format() is exactly this builtin applied to a non-None value
+COMPILED_FIELDS = {fields.String: 'str', fields.Integer: 'int', fields.Float: 'float'}
+
+
+def compile_marshaller(model):
+    """
+    Return a function equivalent to marshal(data, model) for a dict or a list of dicts.
+    Models with other fields (nested, lists, attribute/default overrides, ...)
+    just get marshal() back.
+    """
+    source = ['def marshal_one(obj):', '    get = obj.get']
+    values = []
+    for i, (key, field) in enumerate(model.items()):
+        if (type(field) not in COMPILED_FIELDS or field.attribute is not None
+                or field.default is not None or '.' in key or hasattr(dict, key)):
+            return lambda data: marshal(data, model)
+        source.append(f'    v{i} = get({key!r})')
+        values.append(f'{key!r}: None if v{i} is None else {COMPILED_FIELDS[type(field)]}(v{i})')
+    source.append('    return {' + ', '.join(values) + '}')
+
+    namespace = {}
+    exec(compile('\n'.join(source), f'<marshaller {model.name}>', 'exec'), namespace)
+    marshal_one = namespace['marshal_one']
+
+    def marshaller(data):
+        if isinstance(data, (list, tuple)):
+            return [marshaller(obj) for obj in data]
+        if type(data) is not dict:
+            return marshal(data, model)
+        try:
+            return marshal_one(data)
+        except (TypeError, ValueError):
+            # A value that can't be converted: let marshal() raise its usual error
+            return marshal(data, model)
+
+    return marshaller
+
+
+marshal_book = compile_marshaller(book_model)
+
+
+def marshal_books(data):
+    """Marshal a book or a list of books with book_model, honouring an X-Fields mask"""
+    mask = request.headers.get(app.config['RESTX_MASK_HEADER'])
+    if mask or not FAST_MARSHAL:
+        return marshal(data, book_model, mask=mask)
+    return marshal_book(data)
+
+
+# Query string of GET /api/books, declared once: name -> (type, default, description).
+# The parser and the Swagger parameters are built from it at import time
+# instead of on every request.
+BOOK_LIST_ARGS = {
+    'author': (str, None, 'Filter books by author name (partial match)'),
+    'title': (str, None, 'Filter books by title (partial match)'),
+    'page': (int, 1, 'Page number for pagination'),
+    'limit': (int, 10, 'Number of books per page'),
+}
+
+book_list_parser = api.parser()
+for _name, (_type, _default, _help) in BOOK_LIST_ARGS.items():
+    book_list_parser.add_argument(_name, type=_type, default=_default, location='args', help=_help)
+
+
+def parse_book_list_args():
+    """
+    Same result as book_list_parser.parse_args(), without its per-argument machinery.
+    Values are converted directly; the parser only runs when one doesn't
+    convert, to send its usual 400 response.
+    """
+    query = request.args
+    args = {}
+    for name, (convert, default, _) in BOOK_LIST_ARGS.items():
+        value = query.get(name)
+        if value is None:
+            args[name] = default
+            continue
+        try:
+            args[name] = convert(value)
+        except ValueError:
+            return book_list_parser.parse_args()
+    return args
+
 @ns.route('/books')
 class BookList(Resource):
-    @ns.doc('list_books', params={
-        'author': 'Filter books by author name (partial match)',
-        'page': 'Page number for pagination (default: 1)',
-        'limit': 'Number of books per page (default: 10)'
-    })
-    @ns.marshal_list_with(book_model)
+    @ns.doc('list_books')
+    @ns.expect(book_list_parser)
+    @ns.response(200, 'Success', [book_model])
+    @ns.response(304, 'Not modified since the ETag sent in If-None-Match')
     def get(self):
         """
         List all books
         Returns a list of books with optional filtering and pagination.
         """
-        parser = api.parser()
-        parser.add_argument('author', type=str, help='Filter by author name')
-        parser.add_argument('page', type=int, default=1, help='Page number')
-        parser.add_argument('limit', type=int, default=10, help='Books per page')
-        args = parser.parse_args()
+        args = parse_book_list_args()
 
-        result = list(books.values())
+        # Any write changes the version, so a matching ETag means no page changed
+        etag = masked_etag(f'{STORE_EPOCH}-{books_version}')
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
 
-        # Filter by author if provided
-        if args['author']:
-            result = [b for b in result if args['author'].lower() in b['author'].lower()]
+        # Filter by author and/or title if provided (indexed, no scan over every book)
+        if args['author'] or args['title']:
+            result = book_index.search(args['author'], args['title'])
+        else:
+            result = list(books)
 
-        # Pagination
+        # Pagination (only the books on this page are looked up)
         page = args['page']
         limit = args['limit']
         start = (page - 1) * limit
         end = start + limit
-        paginated = result[start:end]
+        paginated = [books[book_id] for book_id in result[start:end]]
 
-        return paginated
+        return marshal_books(paginated), 200, etag_headers(etag)
 
     @ns.doc('create_book')
     @ns.expect(book_input, validate=True)
@@ -99,40 +254,56 @@ class BookList(Resource):
             'isbn': data.get('isbn')
         }
         books[next_id] = book
+        book_index.add(book)
+        book_changed(next_id)
         next_id += 1
 
-        return book, 201
+        return book, 201, etag_headers(masked_etag(book_etag(book['id'])))
 
 @ns.route('/books/<int:id>')
 @ns.param('id', 'The book identifier')
 class Book(Resource):
     @ns.doc('get_book')
-    @ns.marshal_with(book_model)
+    @ns.response(200, 'Success', book_model)
+    @ns.response(304, 'Not modified since the ETag sent in If-None-Match')
     @ns.response(404, 'Book not found')
     def get(self, id):
         """
         Get a book by ID
         Returns a single book if it exists, otherwise returns 404.
+        Send the ETag of a previous response in If-None-Match to get an
+        empty 304 while the book is unchanged.
         """
         if id not in books:
             api.abort(404, f"Book {id} not found")
-        return books[id]
+
+        etag = masked_etag(book_etag(id))
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+        return marshal_books(books[id]), 200, etag_headers(etag)
 
     @ns.doc('update_book')
     @ns.expect(book_input)
     @ns.marshal_with(book_model)
     @ns.response(404, 'Book not found')
     @ns.response(400, 'Validation Error')
+    @ns.response(412, 'The book changed since the ETag sent in If-Match')
     def put(self, id):
         """
         Update a book
         All fields are optional - only provided fields will be updated.
+        Send the book's ETag in If-Match to fail with 412 instead of
+        overwriting someone else's changes.
         """
         if id not in books:
             api.abort(404, f"Book {id} not found")
+        if request.if_match and not matches_if_match(id):
+            api.abort(412, f"Book {id} was modified since it was fetched")
 
         data = api.payload
         book = books[id]
+        book_index.remove(book)
 
         if 'title' in data:
             book['title'] = data['title']
@@ -142,8 +313,10 @@ class Book(Resource):
             book['year'] = data['year']
         if 'isbn' in data:
             book['isbn'] = data['isbn']
+        book_index.add(book)
+        book_changed(id)
 
-        return book
+        return book, 200, etag_headers(masked_etag(book_etag(id)))
 
     @ns.doc('delete_book')
     @ns.response(204, 'Book deleted')
@@ -156,7 +329,8 @@ class Book(Resource):
         if id not in books:
             api.abort(404, f"Book {id} not found")
 
-        del books[id]
+        book_index.remove(books.pop(id))
+        book_changed(id)
         return '', 204
 
 if __name__ == '__main__':
@@ -4,6 +4,7 @@ This API has NO documentation - students must figure it out through trial and er
 """
 
 from flask import Flask, jsonify, request
+from book_search import BookIndex
 
 app = Flask(__name__)
 
@@ -15,6 +16,11 @@ books = {
 }
 next_id = 4
 
+
+# Search indexes, kept up to date by every create, update and delete
+book_index = BookIndex(books.values())
+
+
 @app.route('/')
 def index():
     return 'Books API is running. But where are the endpoints? 🤔'
@@ -26,19 +32,21 @@ def handle_books():
     if request.method == 'GET':
         # Support filtering by author (but students don't know this!)
         author = request.args.get('author')
+        title = request.args.get('title')
         # Support pagination (but students don't know the param names!)
         page = request.args.get('page', 1, type=int)
         limit = request.args.get('limit', 10, type=int)
 
-        result = list(books.values())
-
-        if author:
-            result = [b for b in result if author.lower() in b['author'].lower()]
+        # Book ids, filtered through the search indexes instead of a scan
+        if author or title:
+            result = book_index.search(author, title)
+        else:
+            result = list(books)
 
         # Simple pagination
         start = (page - 1) * limit
         end = start + limit
-        paginated = result[start:end]
+        paginated = [books[book_id] for book_id in result[start:end]]
 
         return jsonify({
             'books': paginated,
@@ -65,6 +73,7 @@ def handle_books():
             'isbn': data.get('isbn')
         }
         books[next_id] = book
+        book_index.add(book)
         next_id += 1
 
         return jsonify(book), 201
@@ -86,6 +95,7 @@ def handle_book(book_id):
 
         # Update fields
         book = books[book_id]
+        book_index.remove(book)
         if 'title' in data:
             book['title'] = data['title']
         if 'author' in data:
@@ -94,6 +104,7 @@ def handle_book(book_id):
             book['year'] = data['year']
         if 'isbn' in data:
             book['isbn'] = data['isbn']
+        book_index.add(book)
 
         return jsonify(book)
 
@@ -102,6 +113,7 @@ def handle_book(book_id):
             return jsonify({'error': 'Not found'}), 404
 
         deleted = books.pop(book_id)
+        book_index.remove(deleted)
         return jsonify({'message': 'Book deleted', 'book': deleted})
 
 if __name__ == '__main__':